@@ -0,0 +1,72 @@
+"""benchmark of parsing release pages: time of ReleasePageParser.parse on synthetic pages of growing size.
+run from the repository root: python benchmarks/bench_release_parsing.py [--legacy]
+--legacy also times the regexps which were used by Release before ReleasePageParser,
+they backtrack over the whole page and take seconds already at ~100 checklist items, use small --sizes with it"""
+import os
+import re
+import sys
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fap_library import ReleasePageParser
+from synthetic import make_release_page
+
+
+def legacy_parse(page_value):
+    """the regexps over the whole page which Release used before ReleasePageParser"""
+    fields = {'date_prod_moved': '', 'date_finalize_moved': ''}
+    fields['status'] = re.search('Статус:[&nbsp;\\s]*<strong>([\\w|\\W|\\d|\\s]*?)</strong></li>', page_value).group(1)
+    fields['type'] = re.search(
+                        r'Тип релиза:[&nbsp;\s]*[<strong>]*(\w*?)<[/strong></li></ul><ul><li>Установка]*', page_value
+                     ).group(1)
+    if re.search('<li>Финализация.*<s>.*енесено.*тест', page_value):
+        fields['date_finalize'] = re.search(
+                        '<li>Финализация.*еренесено.*(\\d\\d\\s\\w*).*</li><li>.*Завершение', page_value
+                     ).group(1)
+        fields['date_finalize_moved'] = True
+    else:
+        fields['date_finalize'] = re.search(
+                        '<li>Финализация.*(\\d\\d\\s\\w*).*</li><li>.*Завершение', page_value
+                     ).group(1)
+    if re.search('<li>.*продуктив.*<s>.*енесено.*инали', page_value):
+        matches = re.search(
+                        '<li>.*продуктив.*<s>.*(\\d\\d\\s\\w*).*</s>.*еренесено на.*(\\d\\d\\s\\w*).*</li><li>.*Финал',
+                        page_value
+                  )
+        fields['date_prod'] = matches.group(1)
+        fields['date_prod_moved'] = matches.group(2)
+    else:
+        fields['date_prod'] = re.search('<li>.*продуктив.*(\\d\\d\\s\\w*).*</li><li>.*Финал', page_value).group(1)
+    return fields
+
+
+def measure(function, page_value, repeat):
+    return min(timeit.repeat(lambda: function(page_value), number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='checklist lengths of the pages')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--legacy', action='store_true', help='time the legacy regexps too')
+    args = parser.parse_args()
+
+    print('%8s %16s %10s %12s %12s %14s' % ('items', 'layout', 'page KB', 'parse ms', 'us per KB', 'legacy ms'))
+    for size, checklist_first in [(int(size), layout) for size in args.sizes.split(',') for layout in (False, True)]:
+        page_value = make_release_page(size, checklist_first=checklist_first)
+        kbytes = len(page_value.encode('utf-8')) / 1024
+        parse_time = measure(ReleasePageParser.parse, page_value, args.repeat)
+        legacy = '-'
+        if args.legacy:
+            if legacy_parse(page_value) != ReleasePageParser.parse(page_value):
+                print('WARN: the parser and the legacy regexps give different fields for', size, 'items')
+            legacy = '%.3f' % (measure(legacy_parse, page_value, args.repeat) * 1000)
+        layout = 'checklist first' if checklist_first else 'fields first'
+        print('%8d %16s %10.1f %12.3f %12.2f %14s' % (
+                size, layout, kbytes, parse_time * 1000, parse_time * 1e6 / kbytes, legacy
+        ))
+
+
+if __name__ == '__main__':
+    main()
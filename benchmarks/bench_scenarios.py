@@ -0,0 +1,65 @@
+"""benchmark of the schedule run against the local fake confluence, no real confluence is needed.
+for every size the fake gets that many release pages, a schedule with a row per release and a page tree
+with that many descendants, then the scenarios are timed:
+    releases - fetching and parsing all the release pages(Confluence.load_releases)
+    schedule - Schedule construction and update_schedule_page
+    permissions - PagePermissions.apply over the page tree
+run from the repository root: python benchmarks/bench_scenarios.py [--sizes 10,100,1000] [--latency 0.01]"""
+import os
+import sys
+import argparse
+import contextlib
+import io
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fap_library import Confluence, PagePermissions, Schedule
+from fake_confluence import FakeConfluence, Store
+from synthetic import populate
+
+
+def run_scenario(fake, function):
+    """seconds and requests the function took"""
+    calls = len(fake.store.calls)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+    return time.perf_counter() - start, len(fake.store.calls) - calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,100,1000', help='how many releases the schedule has')
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds the fake waits before every answer')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--checklist', type=int, default=20, help='checklist items on every release page')
+    args = parser.parse_args()
+
+    print('%8s %14s %12s %10s' % ('releases', 'scenario', 'seconds', 'requests'))
+    for size in [int(size) for size in args.sizes.split(',')]:
+        store = Store()
+        schedule_id, titles = populate(store, size, checklist_items=args.checklist)
+        root_id = store.add('Permissions root', '<p>root</p>')
+        for num in range(size):
+            store.add('Permissions child ' + str(num), '<p>child</p>', parent_id=root_id)
+        with FakeConfluence(store, latency=args.latency) as fake:
+            confluence = Confluence(fake.url, 'bench', 'bench', pool_size=max(10, args.workers))
+
+            def schedule_run():
+                schedule = Schedule(store.pages[schedule_id]['title'], confluence, args.workers)
+                schedule.update_schedule_page()
+                if schedule.errors:
+                    raise RuntimeError(schedule.errors[0])
+
+            scenarios = [
+                ('releases', lambda: confluence.load_releases(titles, workers=args.workers)),
+                ('schedule', schedule_run),
+                ('permissions', lambda: PagePermissions(confluence, args.workers).apply('Permissions root')),
+            ]
+            for name, function in scenarios:
+                seconds, requests_count = run_scenario(fake, function)
+                print('%8d %14s %12.3f %10d' % (size, name, seconds, requests_count))
+
+
+if __name__ == '__main__':
+    main()
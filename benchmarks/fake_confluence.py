@@ -0,0 +1,261 @@
+"""local stand-in of confluence for the benchmarks, it keeps the pages in memory.
+rest: GET /rest/api/content?title=, GET /rest/api/content/search?cql=, GET /rest/api/content/{id},
+GET /rest/api/content/{id}/child/page, PUT /rest/api/content/{id}(409 if the version is not the next one),
+POST /rest/api/content. xml-rpc on /rpc/xmlrpc: confluence2.login and confluence2.setContentPermissions.
+cql supports the clauses fap_library uses joined with 'and': type, space, title =/in/~, id in, parent, ancestor
+and lastmodified >, optionally ordered by lastmodified. version.when and lastmodified are in the local time.
+latency - seconds every request waits before it's answered, page_limit - max results a page of a listing has
+whatever limit is asked"""
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+from xmlrpc.server import SimpleXMLRPCDispatcher
+
+
+class Store:
+    """pages of the fake confluence by id, calls - (method, path) of every request in the order they came"""
+
+    def __init__(self, space_key='REL2018'):
+        self.lock = threading.Lock()
+        self.pages = {}
+        self.space_key = space_key
+        self.permissions = {}
+        self.calls = []
+        self._next_id = 1000
+
+    def add(self, title, page_value, parent_id=None, space_key=None):
+        """add a page, returns its id"""
+        with self.lock:
+            self._next_id = self._next_id + 1
+            content_id = str(self._next_id)
+            ancestors = []
+            if parent_id is not None:
+                ancestors = self.pages[parent_id]['ancestors'] + [parent_id]
+            self.pages[content_id] = {
+                'id': content_id,
+                'title': title,
+                'value': page_value,
+                'version': 1,
+                'space': space_key or self.space_key,
+                'ancestors': ancestors,
+                'modified': time.time(),
+            }
+            return content_id
+
+    def edit(self, content_id, page_value):
+        """change the page as somebody else would do it"""
+        with self.lock:
+            page = self.pages[content_id]
+            page['value'] = page_value
+            page['version'] = page['version'] + 1
+            page['modified'] = time.time()
+
+    def content(self, page, expand_fields):
+        # 'body.storage.value' expands 'body.storage' as well
+        expand = set()
+        for field in (expand_fields.split(',') if expand_fields else []):
+            parts = field.split('.')
+            expand.update('.'.join(parts[:num]) for num in range(1, len(parts) + 1))
+        content = {
+            'id': page['id'],
+            'type': 'page',
+            'status': 'current',
+            'title': page['title'],
+            '_expandable': {'space': '/rest/api/space/' + page['space']},
+        }
+        if 'version' in expand:
+            content['version'] = {
+                'number': page['version'],
+                'when': datetime.fromtimestamp(page['modified']).astimezone().isoformat(timespec='milliseconds'),
+            }
+        if 'body.storage' in expand:
+            content['body'] = {'storage': {'value': page['value'], 'representation': 'storage'}}
+        if 'space' in expand:
+            content['space'] = {'key': page['space']}
+            del content['_expandable']['space']
+        if 'ancestors' in expand:
+            content['ancestors'] = [{'id': ancestor} for ancestor in page['ancestors']]
+        return content
+
+    def search(self, cql):
+        pages = list(self.pages.values())
+        order = re.search(r'\s+order\s+by\s+lastmodified(\s+desc)?\s*$', cql, re.I)
+        if order is not None:
+            cql = cql[:order.start()]
+        for clause in re.split(r'\s+and\s+', cql, flags=re.I):
+            matches = re.match(r'(\w+)\s*(=|in|>|~)\s*(.*)$', clause.strip(), re.I | re.S)
+            if matches is None:
+                raise ValueError('unsupported cql: ' + clause)
+            field, operator, value = matches.group(1).lower(), matches.group(2).lower(), matches.group(3).strip()
+            if operator == 'in':
+                values = set()
+                for quoted, number in re.findall(r'"((?:[^"\\]|\\.)*)"|(\d+)', value):
+                    values.add(quoted.replace('\\"', '"') if quoted else number)
+            else:
+                values = {value.strip('"')}
+            if field == 'type':
+                continue
+            elif field == 'title' and operator == '~':
+                needle = value.strip('"').strip('*').lower()
+                pages = [page for page in pages if needle in page['title'].lower()]
+            elif field == 'title':
+                pages = [page for page in pages if page['title'] in values]
+            elif field == 'id':
+                pages = [page for page in pages if page['id'] in values]
+            elif field == 'parent':
+                pages = [page for page in pages if page['ancestors'] and page['ancestors'][-1] in values]
+            elif field == 'ancestor':
+                pages = [page for page in pages if values & set(page['ancestors'])]
+            elif field == 'space':
+                pages = [page for page in pages if page['space'] in values]
+            elif field == 'lastmodified' and operator == '>':
+                since = time.mktime(time.strptime(value.strip('"'), '%Y-%m-%d %H:%M'))
+                pages = [page for page in pages if page['modified'] > since]
+            else:
+                raise ValueError('unsupported cql: ' + clause)
+        if order is not None:
+            return sorted(pages, key=lambda page: page['modified'], reverse=order.group(1) is not None)
+        return sorted(pages, key=lambda page: int(page['id']))
+
+
+def make_handler(store, latency=0.0, page_limit=25):
+    dispatcher = SimpleXMLRPCDispatcher(allow_none=True)
+
+    def login(user, password):
+        return 'token-' + user
+
+    def set_content_permissions(token, content_id, operation, pattern):
+        if not token.startswith('token-'):
+            raise Exception('invalid token')
+        with store.lock:
+            store.permissions[content_id] = (operation, pattern)
+        return True
+    dispatcher.register_function(login, 'confluence2.login')
+    dispatcher.register_function(set_content_permissions, 'confluence2.setContentPermissions')
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # headers and body are sent by separate writes, with nagle every answer would wait for the delayed ack
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, data, content_type='application/json'):
+            if not isinstance(data, bytes):
+                data = json.dumps(data).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_body(self):
+            return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        def _listing(self, pages, query, path):
+            start = int(query.get('start', ['0'])[0])
+            limit = min(int(query.get('limit', [str(page_limit)])[0]), page_limit)
+            chunk = pages[start:start + limit]
+            listing = {
+                'results': [store.content(page, query.get('expand', [''])[0]) for page in chunk],
+                'start': start,
+                'limit': limit,
+                'size': len(chunk),
+                '_links': {},
+            }
+            if start + limit < len(pages):
+                next_query = dict((key, values[0]) for key, values in query.items())
+                next_query.update(start=str(start + limit), limit=str(limit))
+                listing['_links']['next'] = path + '?' + urlencode(next_query)
+            return listing
+
+        def _begin(self, method):
+            time.sleep(latency)
+            with store.lock:
+                store.calls.append((method, self.path))
+
+        def do_GET(self):
+            self._begin('GET')
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == '/rest/api/content':
+                title = query.get('title', [None])[0]
+                space_key = query.get('spaceKey', [None])[0]
+                pages = [page for page in store.pages.values()
+                         if page['title'] == title and space_key in (None, page['space'])]
+                return self._send(200, self._listing(pages, query, url.path))
+            if url.path == '/rest/api/content/search':
+                try:
+                    pages = store.search(query['cql'][0])
+                except ValueError as e:
+                    return self._send(400, {'message': str(e)})
+                return self._send(200, self._listing(pages, query, url.path))
+            matches = re.match(r'^/rest/api/content/(\d+)/child/page$', url.path)
+            if matches:
+                pages = [page for page in store.pages.values()
+                         if page['ancestors'] and page['ancestors'][-1] == matches.group(1)]
+                pages.sort(key=lambda page: int(page['id']))
+                return self._send(200, self._listing(pages, query, url.path))
+            matches = re.match(r'^/rest/api/content/(\d+)$', url.path)
+            if matches and matches.group(1) in store.pages:
+                page = store.pages[matches.group(1)]
+                return self._send(200, store.content(page, query.get('expand', [''])[0]))
+            self._send(404, {'message': 'not found'})
+
+        def do_PUT(self):
+            self._begin('PUT')
+            content = json.loads(self._read_body())
+            matches = re.match(r'^/rest/api/content/(\d+)$', self.path)
+            page = store.pages.get(matches.group(1)) if matches else None
+            if page is None:
+                return self._send(404, {'message': 'not found'})
+            with store.lock:
+                if int(content['version']['number']) != page['version'] + 1:
+                    return self._send(409, {'message': 'version conflict'})
+                page['version'] = page['version'] + 1
+                page['value'] = content['body']['storage']['value']
+                page['title'] = content['title']
+                page['modified'] = time.time()
+            self._send(200, store.content(page, 'version,body.storage'))
+
+        def do_POST(self):
+            self._begin('POST')
+            data = self._read_body()
+            if self.path == '/rpc/xmlrpc':
+                return self._send(200, dispatcher._marshaled_dispatch(data), 'text/xml')
+            if self.path == '/rest/api/content':
+                content = json.loads(data)
+                parent_id = content['ancestors'][0]['id'] if content.get('ancestors') else None
+                content_id = store.add(
+                                    content['title'],
+                                    content['body']['storage']['value'],
+                                    parent_id,
+                                    content['space']['key']
+                )
+                return self._send(200, store.content(store.pages[content_id], 'version'))
+            self._send(404, {'message': 'not found'})
+    return Handler
+
+
+class FakeConfluence:
+    """the server in a background thread, url - the base url to give to fap_library.Confluence"""
+
+    def __init__(self, store=None, latency=0.0, page_limit=25):
+        self.store = store if store is not None else Store()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(self.store, latency, page_limit))
+        self.server.daemon_threads = True
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
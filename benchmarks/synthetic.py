@@ -0,0 +1,98 @@
+"""synthetic release pages and release schedules in the storage format which fap_library parses"""
+
+MONTHS = ['января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
+          'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря']
+WEEKDAYS = ['пн', 'вт', 'ср', 'чт', 'пт', 'сб', 'вс']
+# product codes of the release titles with their names in the schedule, see Schedule.product_ru_en_dict
+PRODUCTS = [('PGU', 'ПГУ'), ('ESIA', 'ЕСИА'), ('SMEV', 'СМЭВ'), ('GEPS', 'ГЕПС'), ('SKUF', 'СКУФ')]
+
+
+def relpage_date(day_month):
+    """(12, 9) -> '12 сентября'"""
+    return '%02d %s' % (day_month[0], MONTHS[day_month[1] - 1])
+
+
+def schedule_date(day_month, year=2018):
+    """(12, 9) -> '09/12-ср'"""
+    from datetime import date
+    return '%02d/%02d-%s' % (day_month[1], day_month[0], WEEKDAYS[date(year, day_month[1], day_month[0]).weekday()])
+
+
+def release_title(num):
+    """title of the num-th synthetic release, products go in turn"""
+    product = PRODUCTS[num % len(PRODUCTS)][0]
+    return '%s-Release-1.%d.%d' % (product, num // 100, num % 100)
+
+
+def make_release_page(checklist_items, moved=True, checklist_first=False, status='Тестирование',
+                      prod=(12, 9), prod_moved=(15, 9), finalize=(14, 9), finalize_moved=(18, 9)):
+    """storage value of a release page with a checklist of the given length,
+    checklist_first puts the checklist before the release fields, so the whole page has to be walked"""
+    if moved:
+        prod_item = '<li>Установка в продуктив - <s>' + relpage_date(prod) + '</s> перенесено на: ' + \
+                    relpage_date(prod_moved) + '</li>'
+        finalize_item = '<li>Финализация релиза - <s>' + relpage_date(finalize) + '</s> перенесено на: ' + \
+                        relpage_date(finalize_moved) + '</li>'
+    else:
+        prod_item = '<li>Установка в продуктив - ' + relpage_date(prod) + '</li>'
+        finalize_item = '<li>Финализация релиза - ' + relpage_date(finalize) + '</li>'
+    checklist = ''.join(
+        '<li>Проверка ' + str(num) + ': выполнена 10 сентября, ответственный <strong>инженер</strong></li>'
+        for num in range(checklist_items)
+    )
+    fields = '<ul><li>Статус: <strong>' + status + '</strong></li><li>Тип релиза: <strong>Плановый</strong></li></ul>' \
+             '<ul>' + prod_item + finalize_item + '<li>Завершение тестирования - 10 сентября</li></ul>'
+    checklist = '<h2>Чек-лист</h2><ul>' + checklist + '</ul>'
+    if checklist_first:
+        return '<p>Описание релиза</p>' + checklist + fields
+    return '<p>Описание релиза</p>' + fields + checklist
+
+
+def schedule_row(title, product_ru, prod='09/12-ср', prod_moved='', finalize='09/14-пт', status='Тестирование'):
+    """a row of the schedule table linked to the release page"""
+    return '<tr><td colspan="1"><span>' + prod + '</span></td>' \
+           '<td colspan="1"><span>' + prod_moved + '</span></td>' \
+           '<td colspan="1"><span>' + finalize + '</span></td>' \
+           '<td colspan="1">' + product_ru + '</td>' \
+           '<td colspan="1"><ac:link><ri:page ri:content-title="' + title + '" /><ac:plain-text-link-body>' \
+           '<![CDATA[' + title.split('-Release-')[-1] + ']]></ac:plain-text-link-body></ac:link></td>' \
+           '<td colspan="1">Плановый</td>' \
+           '<td colspan="1"><strong>' + status + '</strong></td>' \
+           '<td colspan="1"><br/></td><td colspan="1"><br/></td></tr>'
+
+
+def schedule_page(rows):
+    """the schedule page with the table of the rows in an expand macro"""
+    top = '<tr><th>Прод</th><th>Перенос</th><th>Финализация</th><th>Продукт</th><th>Релиз</th>' \
+          '<th>Тип</th><th>Статус</th><th>Комментарий</th><th>Ответственный</th></tr>'
+    return '<p>График релизов</p><ac:structured-macro ac:name="expand"><ac:rich-text-body>' \
+           '<table><tbody>' + top + ''.join(rows) + '</tbody></table></ac:rich-text-body></ac:structured-macro>'
+
+
+def populate(store, releases, stale_every=2, prod_every=10, checklist_items=20, schedule_title='Release schedule'):
+    """add the release pages and the schedule with a row per release to the fake confluence store.
+    every stale_every-th row has an old status, so update_schedule_page has something to change,
+    every prod_every-th release is in PROD and is skipped by the schedule update.
+    returns the schedule id and the release titles"""
+    rows = []
+    titles = []
+    for num in range(releases):
+        title = release_title(num)
+        status = 'PROD' if prod_every and num % prod_every == prod_every - 1 else 'Тестирование'
+        day_month = (1 + num % 28, 1 + num // 28 % 12)
+        moved_day_month = (1 + (num + 3) % 28, day_month[1])
+        store.add(title, make_release_page(
+                                        checklist_items,
+                                        moved=num % 3 == 0,
+                                        status=status,
+                                        prod=day_month,
+                                        prod_moved=moved_day_month,
+                                        finalize=moved_day_month,
+                                        finalize_moved=moved_day_month
+        ))
+        row_status = 'Разработка' if stale_every and num % stale_every == 0 and status != 'PROD' else status
+        rows.append(schedule_row(title, PRODUCTS[num % len(PRODUCTS)][1], schedule_date(day_month), '',
+                                 schedule_date(moved_day_month), row_status))
+        titles.append(title)
+    schedule_id = store.add(schedule_title, schedule_page(rows))
+    return schedule_id, titles
@@ -1,125 +1,724 @@
 import re
+import os
 import argparse
+import itertools
 import json
-from datetime import date
-import requests
-import xmlrpc.client
-from bs4 import BeautifulSoup
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+# requests, xmlrpc.client and bs4 are imported where they are used first, runs which do not need them start faster
 
 
 
+class ParsedDate:
+    """a date of a release parsed once and converted to any of the formats,
+    bash = dd-mm, relpage = dd месяц, shedule = mm/dd - день недели двумя буквами.
+    parse() returns the same object for the same src_date and year, so a date is never parsed twice.
+    ValueError is raised if the date is in none of the formats or can't be converted"""
+
+    __slots__ = ('src_date', 'year', 'format', '_bash', '_relpage', '_schedule')
+
+    months = {
+        'января': '01', 'февраля': '02', 'марта': '03', 'апреля': '04',
+        'мая': '05', 'июня': '06', 'июля': '07', 'августа': '08',
+        'сентября': '09', 'октября': '10', 'ноября': '11', 'декабря': '12'
+    }
+    month_words = {num: word for word, num in months.items()}
+    weekdays = ('пн', 'вт', 'ср', 'чт', 'пт', 'сб', 'вс')
+
+    _bash_re = re.compile(r'^\d\d-\d\d$')
+    _relpage_re = re.compile(r'^\d\d*\s\w*$')
+    _schedule_re = re.compile(r'^\d\d*/\d\d*-\w*$')
+    _leading_day_re = re.compile(r'^(\d\d*)')
+    _trailing_word_re = re.compile(r'(\w*)$')
+    _relpage_parts_re = re.compile(r'(\d*)\s(\w*)')
+    _schedule_parts_re = re.compile(r'(\d*)/(\d*)-.*$')
+    _schedule_day_re = re.compile(r'^.*/(\d\d)-')
+    _schedule_month_re = re.compile(r'^(\d\d)/')
+    _bash_day_re = re.compile(r'^(\d\d)-')
+    _bash_month_re = re.compile(r'^.*-(\d\d)')
+
+    def __init__(self, src_date, year):
+        self.src_date = src_date
+        self.year = year
+        if self._bash_re.search(src_date):
+            self.format = 'bash'
+        elif self._relpage_re.search(src_date):
+            self.format = 'relpage'
+        elif self._schedule_re.search(src_date):
+            self.format = 'schedule'
+        else:
+            raise ValueError('unrecognized date format: ' + repr(src_date))
+        self._bash = None
+        self._relpage = None
+        self._schedule = None
+
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def parse(cls, src_date, year):
+        return cls(src_date, year)
+
+    @classmethod
+    def convert(cls, dates, aim_format, errors='raise'):
+        """convert a column of (src_date, year) to the aim_format('bash', 'relpage' or 'schedule'),
+        empty dates stay as they are, every distinct date of a year is converted once.
+        errors='keep' puts the ValueError in place of a date which can't be converted instead of raising it"""
+        converted = {}
+        result = []
+        for src_date, year in dates:
+            if not src_date:
+                result.append(src_date)
+                continue
+            if (src_date, year) not in converted:
+                try:
+                    converted[src_date, year] = getattr(cls.parse(src_date, year), 'to_' + aim_format)()
+                except ValueError as e:
+                    if errors != 'keep':
+                        raise
+                    converted[src_date, year] = e
+            result.append(converted[src_date, year])
+        return result
+
+    def _weekday(self, month, day):
+        return self.weekdays[date(int(self.year), int(month), int(day)).weekday()]
+
+    def _fail(self, aim_format, error):
+        raise ValueError('can not convert ' + repr(self.src_date) + ' from the ' + self.format + ' format to the ' +
+                         aim_format + ' format') from error
+
+    def to_bash(self):
+        if self._bash is None:
+            try:
+                if self.format == 'bash':
+                    self._bash = self.src_date
+                elif self.format == 'relpage':
+                    day = self._leading_day_re.search(self.src_date).group(1).rjust(2, '0')
+                    month = self._trailing_word_re.search(self.src_date).group(1)
+                    self._bash = day + '-' + self.months[month]
+                else:
+                    matches = self._schedule_parts_re.search(self.src_date)
+                    self._bash = matches.group(2) + '-' + matches.group(1)
+            except (AttributeError, KeyError) as e:
+                self._fail('bash', e)
+        return self._bash
+
+    def to_relpage(self):
+        if self._relpage is None:
+            try:
+                if self.format == 'relpage':
+                    self._relpage = self.src_date
+                elif self.format == 'bash':
+                    day = self._leading_day_re.search(self.src_date).group(1)
+                    month = self._trailing_word_re.search(self.src_date).group(1)
+                    self._relpage = day + ' ' + self.month_words[month]
+                else:
+                    day = self._schedule_day_re.search(self.src_date).group(1)
+                    month = self._schedule_month_re.search(self.src_date).group(1)
+                    self._relpage = day + ' ' + self.month_words[month]
+            except (AttributeError, KeyError) as e:
+                self._fail('relpage', e)
+        return self._relpage
+
+    def to_schedule(self):
+        if self._schedule is None:
+            try:
+                if self.format == 'schedule':
+                    self._schedule = self.src_date
+                elif self.format == 'relpage':
+                    matches = self._relpage_parts_re.search(self.src_date)
+                    day = matches.group(1).rjust(2, '0')
+                    month = self.months[matches.group(2)]
+                    self._schedule = month + '/' + day + '-' + self._weekday(month, day)
+                else:
+                    day = self._bash_day_re.search(self.src_date).group(1)
+                    month = self._bash_month_re.search(self.src_date).group(1)
+                    self._schedule = month + '/' + day + '-' + self._weekday(month, day)
+            except (AttributeError, KeyError) as e:
+                self._fail('schedule', e)
+        return self._schedule
+
+    def to_date(self):
+        """datetime.date of the date in the year"""
+        day, month = self.to_bash().split('-')
+        return date(int(self.year), int(month), int(day))
+
+
 class ReleaseDate:
     """The object may be created with any of 3 formats of date and allow convert to any of them
-    bash = dd-mm, relpage = dd месяц, shedule = mm/dd - день недели двумя буквами"""
+    bash = dd-mm, relpage = dd месяц, shedule = mm/dd - день недели двумя буквами.
+    the conversions are made by ParsedDate, ValueError is raised for a date in none of the formats"""
+
+    _months_dict = ParsedDate.months
+    _week_dict = {str(num): word for num, word in enumerate(ParsedDate.weekdays)}
 
     def __init__(self, src_date, year):
         self.src_date = src_date
         self.year = year
-        if re.search(r'^\d\d-\d\d$', self.src_date):
-            self._format = 'bash'
-        elif re.search(r'^\d\d*\s\w*$', self.src_date):
-            self._format = 'relpage'
-        elif re.search(r'^\d\d*/\d\d*-\w*$', self.src_date):
-            self._format = 'schedule'
-
-        self._months_dict = {
-            'января': '01', 'февраля': '02', 'марта': '03', 'апреля': '04',
-            'мая': '05', 'июня': '06', 'июля': '07', 'августа': '08',
-            'сентября': '09', 'октября': '10', 'ноября': '11', 'декабря': '12'
-        }
-        self._week_dict = {
-            '0': 'пн', '1': 'вт', '2': 'ср', '3': 'чт',
-            '4': 'пт', '5': 'сб', '6': 'вс'
-        }
+        self._parsed = ParsedDate.parse(src_date, year)
+        self._format = self._parsed.format
 
     def to_bash(self):
-        if self._format == 'bash':
-            self.aim_date = self.src_date
-        elif self._format == 'relpage':
-            day = re.search(r'^(\d\d*).*$', self.src_date).group(1)
-            if len(day) == 1:
-                day = '0' + day
-            month = re.search(r'(\w*)$', self.src_date).group(1)
-            month_digit = self._months_dict[month]
-            self.aim_date = day + '-' + month_digit
-        elif self._format == 'schedule':
-            matches = re.search('(\d*)/(\d*)-.*$', self.src_date)
-            day = matches.group(2)
-            month = matches.group(1)
-            self.aim_date = day + '-' + month
+        self.aim_date = self._parsed.to_bash()
         return self.aim_date
 
     def to_relpage(self):
-        if self._format == 'relpage':
-            self.aim_date = self.src_date
-        elif self._format == 'bash':
-            day = re.search(r'^(\d\d*)', self.src_date).group(1)
-            month = re.search(r'(\w*)$', self.src_date).group(1)
-            month_word = self.month_to_word(month)
-            self.aim_date = day + ' ' + month_word
-        elif self._format == 'schedule':
-            day = re.search(r'^.*/(\d\d)-', self.src_date).group(1)
-            month = re.search(r'^(\d\d)/', self.src_date).group(1)
-            month_word = self.month_to_word(month)
-            self.aim_date = day + ' ' + month_word
+        self.aim_date = self._parsed.to_relpage()
         return self.aim_date
 
     def to_schedule(self):
-        if self._format == 'schedule':
-            self.aim_date = self.src_date
-        elif self._format == 'relpage':
-            matches = re.search('(\d*)\s(\w*)', self.src_date)
-            day = matches.group(1)
-            if len(day) == 1:
-                day = '0' + day
-            month_word = matches.group(2)
-            month_digit = self._months_dict[month_word]
-            week_day_digit = date(int(self.year), int(month_digit), int(day)).weekday()
-            week_day_word = self._week_dict[str(week_day_digit)]
-            self.aim_date = month_digit + '/' + day + '-' + week_day_word
-        elif self._format == 'bash':
-            day = re.search(r'^(\d\d)-', self.src_date).group(1)
-            month = re.search(r'^.*-(\d\d)', self.src_date).group(1)
-            week_day_digit = date(int(self.year), int(month), int(day)).weekday()
-            week_day_word = self._week_dict[str(week_day_digit)]
-            self.aim_date = month + '/' + day + '-' + week_day_word
+        self.aim_date = self._parsed.to_schedule()
         return self.aim_date
 
     def month_to_word(self, month):
-        for word, num in self._months_dict.items():
-            if num == month:
-                return word
+        return ParsedDate.month_words.get(month)
+
+
+class PageCache:
+    """on-disk cache of pages content keyed by content id, a file per page.
+    the cached body is used only while the cached version is the same as the version on confluence.
+    the least recently used pages are evicted when there are more than max_entries of them
+    or they take more than max_bytes"""
+
+    def __init__(self, path, max_entries=1000, max_bytes=100 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        os.makedirs(self.path, exist_ok=True)
+        files = [entry for entry in os.scandir(self.path) if entry.name.endswith('.json')]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self._lru[entry.name[:-len('.json')]] = entry.stat().st_size
+
+    def _file(self, content_id):
+        return os.path.join(self.path, content_id + '.json')
+
+    def get(self, content_id, version):
+        """returns the cached content if it has the version, else None"""
+        try:
+            with open(self._file(content_id), encoding='utf-8') as cache_file:
+                content = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if int(content['version']['number']) != int(version):
+            return None
+        with self._lock:
+            if content_id in self._lru:
+                self._lru.move_to_end(content_id)
+        try:
+            os.utime(self._file(content_id))
+        except OSError:
+            pass
+        return content
+
+    def put(self, content):
+        data = json.dumps(content, ensure_ascii=False).encode('utf-8')
+        with tempfile.NamedTemporaryFile(dir=self.path, suffix='.tmp', delete=False) as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_file.name, self._file(content['id']))
+        with self._lock:
+            self._lru[content['id']] = len(data)
+            self._lru.move_to_end(content['id'])
+            self._evict()
+
+    def _evict(self):
+        total = sum(self._lru.values())
+        while len(self._lru) > 1 and (len(self._lru) > self.max_entries or total > self.max_bytes):
+            content_id, size = self._lru.popitem(last=False)
+            total = total - size
+            try:
+                os.remove(self._file(content_id))
+            except OSError:
+                pass
+
+
+class Profiler:
+    """records every rest and xml-rpc call and the timings of the phases of a run.
+    endpoints are grouped by the path with ids replaced by {id}, report() gives totals and percentiles"""
+
+    _id_re = re.compile(r'/\d+(?=/|$)')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.calls = []
+        self.phases = []
+
+    def record_call(self, kind, method, endpoint, seconds, size=None, retries=0, status=None, error=False):
+        endpoint = self._id_re.sub('/{id}', endpoint.split('?')[0])
+        with self._lock:
+            self.calls.append({
+                'kind': kind,
+                'method': method,
+                'endpoint': endpoint,
+                'seconds': seconds,
+                'size': size,
+                'retries': retries,
+                'status': status,
+                'error': error,
+            })
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append((name, time.perf_counter() - start))
+
+    @staticmethod
+    def _percentiles(seconds):
+        """nearest-rank percentiles of the timings, milliseconds"""
+        seconds = sorted(seconds)
+
+        def rank(percent):
+            return round(seconds[max(0, -(-len(seconds) * percent // 100) - 1)] * 1000, 3)
+        return {
+            'count': len(seconds),
+            'total_ms': round(sum(seconds) * 1000, 3),
+            'p50_ms': rank(50),
+            'p90_ms': rank(90),
+            'p99_ms': rank(99),
+            'max_ms': round(seconds[-1] * 1000, 3),
+        }
+
+    def report(self):
+        with self._lock:
+            calls = list(self.calls)
+            phases = list(self.phases)
+        groups = OrderedDict()
+        for call in calls:
+            groups.setdefault((call['kind'], call['method'], call['endpoint']), []).append(call)
+        endpoints = []
+        for (kind, method, endpoint), group in groups.items():
+            summary = {'kind': kind, 'method': method, 'endpoint': endpoint}
+            summary.update(self._percentiles([call['seconds'] for call in group]))
+            summary['bytes'] = sum(call['size'] or 0 for call in group)
+            summary['retries'] = sum(call['retries'] for call in group)
+            summary['errors'] = sum(1 for call in group if call['error'])
+            endpoints.append(summary)
+        endpoints.sort(key=lambda summary: summary['total_ms'], reverse=True)
+        phase_groups = OrderedDict()
+        for name, seconds in phases:
+            phase_groups.setdefault(name, []).append(seconds)
+        phases_report = []
+        for name, timings in phase_groups.items():
+            summary = {'phase': name}
+            summary.update(self._percentiles(timings))
+            phases_report.append(summary)
+        return {
+            'wall_ms': round((time.perf_counter() - self._started) * 1000, 3),
+            'totals': {
+                'calls': len(calls),
+                'call_ms': round(sum(call['seconds'] for call in calls) * 1000, 3),
+                'bytes': sum(call['size'] or 0 for call in calls),
+                'retries': sum(call['retries'] for call in calls),
+                'errors': sum(1 for call in calls if call['error']),
+            },
+            'endpoints': endpoints,
+            'phases': phases_report,
+        }
+
+    def dump(self, path):
+        """write the json report to the file, to stdout if path is '-'"""
+        report = json.dumps(self.report(), indent=2)
+        if path == '-':
+            print(report)
+        else:
+            with open(path, 'w', encoding='utf-8') as report_file:
+                report_file.write(report)
+
+
+class _CountingResponse:
+    """http response which counts the bytes read from it"""
+
+    def __init__(self, response):
+        self._response = response
+        self.size = 0
+
+    def read(self, *args):
+        data = self._response.read(*args)
+        self.size = self.size + len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+@lru_cache(maxsize=None)
+def _sized_transport_class(secure):
+    """xml-rpc transport keeping the size of the last response in response_size"""
+    import xmlrpc.client
+    base = xmlrpc.client.SafeTransport if secure else xmlrpc.client.Transport
+
+    class SizedTransport(base):
+        response_size = None
+
+        def parse_response(self, response):
+            counted = _CountingResponse(response)
+            try:
+                return super().parse_response(counted)
+            finally:
+                self.response_size = counted.size
+    return SizedTransport
 
 
 class Confluence:
     """Common cases of using confluence api.
-    using the set_default_page method for the most cases of using the class will be useful"""
+    using the set_default_page method for the most cases of using the class will be useful
+    all rest calls go through one keep-alive session:
+    pool_size - max connections kept open, should not be less than the schedule workers
+    timeout - seconds to wait for connect and for response
+    retries, backoff - how many times and how fast 429 and 5xx responses are retried
+    cache - PageCache, if it's set pages bodies are downloaded only when their version has changed
+    the session and the xml-rpc login are made on the first use.
+    token_cache - file to keep the xml-rpc token between runs for token_ttl seconds
+    profiler - Profiler, if it's set all calls and phases of the run are recorded"""
 
-    def __init__(self, url, login, password):
+    def __init__(self, url, login, password, pool_size=10, timeout=30, retries=3, backoff=0.5, cache=None,
+                 token_cache=None, token_ttl=1200, profiler=None):
         self.url = url
         self.login = login
         self.password = password
-        self.xmlrpc_proxy = xmlrpc.client.ServerProxy(self.url + '/rpc/xmlrpc')
-        self.xmlrpc_token = self.xmlrpc_proxy.confluence2.login(self.login, self.password)
+        self.timeout = timeout
+        self.cache = cache
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.token_cache = token_cache
+        self.token_ttl = token_ttl
+        self.profiler = profiler
+        self._session = None
+        self._local = threading.local()
+        self._xmlrpc_token = None
+        self._token_from_cache = False
+        self._connect_lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._connect_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    from urllib3.util.retry import Retry
+                    session = requests.Session()
+                    session.auth = (self.login, self.password)
+                    retry = Retry(
+                                  total=self.retries,
+                                  backoff_factor=self.backoff,
+                                  status_forcelist=(429, 500, 502, 503, 504),
+                                  raise_on_status=False
+                    )
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    @property
+    def xmlrpc_proxy(self):
+        """ServerProxy keeps one connection, so every thread gets its own proxy"""
+        proxy = getattr(self._local, 'xmlrpc_proxy', None)
+        if proxy is None:
+            import xmlrpc.client
+            transport = _sized_transport_class(self.url.startswith('https'))()
+            proxy = xmlrpc.client.ServerProxy(self.url + '/rpc/xmlrpc', transport=transport)
+            self._local.xmlrpc_transport = transport
+            self._local.xmlrpc_proxy = proxy
+        return proxy
+
+    @property
+    def xmlrpc_token(self):
+        if self._xmlrpc_token is None:
+            with self._connect_lock:
+                if self._xmlrpc_token is None:
+                    token = self._read_token_cache()
+                    self._token_from_cache = token is not None
+                    if token is None:
+                        token = self._xmlrpc_request('login', self.login, self.password)
+                        self._write_token_cache(token)
+                    self._xmlrpc_token = token
+        return self._xmlrpc_token
+
+    def _read_token_cache(self):
+        if self.token_cache is None:
+            return None
+        try:
+            with open(self.token_cache, encoding='utf-8') as token_file:
+                cached = json.load(token_file)
+        except (OSError, ValueError):
+            return None
+        if cached.get('url') != self.url or cached.get('login') != self.login \
+                or time.time() - cached.get('created', 0) > self.token_ttl:
+            return None
+        return cached.get('token')
+
+    def _write_token_cache(self, token):
+        if self.token_cache is None:
+            return
+        data = json.dumps({'url': self.url, 'login': self.login, 'token': token, 'created': time.time()})
+        token_file = os.open(self.token_cache, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(token_file, 'w', encoding='utf-8') as token_file:
+            token_file.write(data)
+
+    def phase(self, name):
+        """context manager timing a phase of the run if there is a profiler"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.phase(name)
+
+    def _xmlrpc_request(self, method, *args, retries=0):
+        """one call of a confluence2 method, it's recorded by the profiler as a call of its own"""
+        if self.profiler is None:
+            return getattr(self.xmlrpc_proxy.confluence2, method)(*args)
+        proxy = self.xmlrpc_proxy
+        transport = self._local.xmlrpc_transport
+        transport.response_size = None
+        start = time.perf_counter()
+        try:
+            result = getattr(proxy.confluence2, method)(*args)
+        except Exception:
+            self.profiler.record_call('xmlrpc', method, '/rpc/xmlrpc', time.perf_counter() - start,
+                                      size=transport.response_size, retries=retries, error=True)
+            raise
+        self.profiler.record_call('xmlrpc', method, '/rpc/xmlrpc', time.perf_counter() - start,
+                                  size=transport.response_size, retries=retries)
+        return result
+
+    def xmlrpc_call(self, method, *args):
+        """call a confluence2 xml-rpc method with the token, a token from the cache is renewed once if it's rejected.
+        the login and the rejected call are recorded by the profiler separately from the retried call"""
+        import xmlrpc.client
+        token = self.xmlrpc_token
+        try:
+            return self._xmlrpc_request(method, token, *args)
+        except xmlrpc.client.Fault:
+            with self._connect_lock:
+                if not self._token_from_cache:
+                    raise
+                if self._xmlrpc_token == token:
+                    self._token_from_cache = False
+                    self._xmlrpc_token = self._xmlrpc_request('login', self.login, self.password)
+                    self._write_token_cache(self._xmlrpc_token)
+            return self._xmlrpc_request(method, self._xmlrpc_token, *args, retries=1)
+
+    def request(self, method, path, **kwargs):
+        """send a rest request through the shared session, path is relative to the confluence url"""
+        kwargs.setdefault('timeout', self.timeout)
+        if self.profiler is None:
+            return self.session.request(method, self.url + path, **kwargs)
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url + path, **kwargs)
+        except Exception:
+            self.profiler.record_call('rest', method, path, time.perf_counter() - start, error=True)
+            raise
+        # urllib3 keeps the retries made for the response
+        retries = getattr(response.raw, 'retries', None)
+        self.profiler.record_call(
+                                'rest',
+                                method,
+                                path,
+                                time.perf_counter() - start,
+                                size=len(response.content),
+                                retries=len(retries.history) if retries is not None else 0,
+                                status=response.status_code,
+                                error=not response.ok
+        )
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def get_content_id(self, title):
+        """returns id of the page without downloading its body"""
+        return self.get_page(title, expand='')['id']
+
+    def find_page(self, title, space_key):
+        """returns json of the page with body.storage and version or None if there is no such page in the space"""
+        response = self.get(
+                            '/rest/api/content',
+                            params={'title': title, 'spaceKey': space_key, 'expand': 'body.storage,version'}
+        )
+        response.raise_for_status()
+        results = response.json()['results']
+        if not results:
+            return None
+        return results[0]
+
+    def create_page(self, title, space_key, parent_id, page_value):
+        """create a child page of the parent page, returns the response"""
+        request_data = json.dumps({
+                                  'type': 'page',
+                                  'title': title,
+                                  'space': {'key': space_key},
+                                  'ancestors': [{'id': parent_id}],
+                                  'body': {'storage': {'value': page_value, 'representation': 'storage'}}
+        })
+        return self.post(
+                        '/rest/api/content',
+                        data=request_data,
+                        headers={'Content-Type': 'application/json', 'Accept': 'application/json'}
+        )
+
+    def _iter_results(self, path, params, limit):
+        """yields content from every page of results of a paginated rest resource, one page is in memory"""
+        start = 0
+        while True:
+            response = self.get(path, params=dict(params, start=start, limit=limit))
+            response.raise_for_status()
+            data = response.json()
+            for content in data['results']:
+                yield content
+            if not data['results'] or 'next' not in data.get('_links', {}):
+                return
+            start = start + len(data['results'])
+
+    def iter_search(self, cql, expand='', limit=50):
+        """yields content found by cql, expand - only the fields which are needed, for example 'version'"""
+        return self._iter_results('/rest/api/content/search', {'cql': cql, 'expand': expand}, limit)
+
+    def iter_children(self, content_id, expand='', limit=50):
+        """yields all child pages of the page"""
+        return self._iter_results('/rest/api/content/' + content_id + '/child/page', {'expand': expand}, limit)
+
+    def search(self, cql, expand='', limit=50):
+        """returns all content found by cql, goes through every page of results"""
+        return list(self.iter_search(cql, expand, limit))
+
+    def get_page(self, title, expand=None):
+        """returns json of the page with body.storage and version,
+        when the cache is set only the version is requested if the page has not changed.
+        expand - fields to request instead of the body and the version, the cache is not used then"""
+        if expand is not None:
+            response = self.get('/rest/api/content', params={'title': title, 'expand': expand})
+            return response.json()['results'][0]
+        if self.cache is None:
+            response = self.get(
+                                '/rest/api/content',
+                                params={'title': title, 'expand': 'body.storage.value,version.number'}
+            )
+            return response.json()['results'][0]
+        response = self.get('/rest/api/content', params={'title': title, 'expand': 'version'})
+        meta = response.json()['results'][0]
+        content = self.cache.get(meta['id'], meta['version']['number'])
+        if content is None:
+            response = self.get('/rest/api/content/' + meta['id'], params={'expand': 'body.storage,version'})
+            response.raise_for_status()
+            content = response.json()
+            self.cache.put(content)
+        return content
+
+    def _search_in(self, field, values, expand, chunk_size, workers):
+        """cql search of pages by 'field in (values)' split to chunks, returns a dict value -> content"""
+        values = list(dict.fromkeys(values))
+        chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+
+        def search_chunk(chunk):
+            if field == 'id':
+                quoted = chunk
+            else:
+                quoted = ['"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"' for value in chunk]
+            return self.search('type=page and ' + field + ' in (' + ','.join(quoted) + ')', expand, limit=chunk_size)
+
+        found = {}
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for results in executor.map(search_chunk, chunks):
+                for content in results:
+                    found[content[field]] = content
+        return found
+
+    def page_versions(self, titles, chunk_size=50, workers=1):
+        """returns a dict title -> (content id, version) of the pages which were found, bodies are not requested"""
+        pages = self._search_in('title', titles, 'version', chunk_size, workers)
+        return {title: (content['id'], int(content['version']['number'])) for title, content in pages.items()}
+
+    def page_spaces(self, titles, chunk_size=50, workers=1):
+        """returns a dict title -> space key of the pages which were found, bodies are not requested"""
+        pages = self._search_in('title', titles, 'space', chunk_size, workers)
+        return {title: content['space']['key'] for title, content in pages.items()}
+
+    def load_pages(self, titles, chunk_size=50, workers=1):
+        """find many pages by titles with a few cql searches instead of a request per title,
+        returns a dict title -> content, titles which were not found are missing in it.
+        when the cache is set bodies are requested only for the pages changed since they were cached"""
+        titles = list(dict.fromkeys(titles))
+        if self.cache is None:
+            pages = self._search_in('title', titles, 'body.storage,version', chunk_size, workers)
+        else:
+            pages = self._search_in('title', titles, 'version', chunk_size, workers)
+            stale = []
+            for title, meta in pages.items():
+                content = self.cache.get(meta['id'], meta['version']['number'])
+                if content is None:
+                    stale.append(meta['id'])
+                else:
+                    pages[title] = content
+            for content in self._search_in('id', stale, 'body.storage,version', chunk_size, workers).values():
+                self.cache.put(content)
+                pages[content['title']] = content
+        return {title: pages[title] for title in titles if title in pages}
+
+    def load_releases(self, titles, workers=1):
+        """the same as load_pages but returns a dict title -> Release,
+        a release page which was found but can't be parsed is returned as the exception"""
+        releases = {}
+        for title, content in self.load_pages(titles, workers=workers).items():
+            try:
+                releases[title] = Release(title, self, content)
+            except Exception as e:
+                releases[title] = e
+        return releases
 
 
 class Page:
-    def __init__(self, page_title, confluence):
+    """content - already loaded json of the page(with body.storage and version), the page is not requested then
+    expand - request only these fields instead of the body and the version, for example '' when only id is needed.
+    page_value and version are None if they were not requested"""
+
+    def __init__(self, page_title, confluence, content=None, expand=None):
         self.page_title = page_title
         self.confluence = confluence
-        self.content = requests.get(
-                                    confluence.url +
-                                    '/rest/api/content?title=' +
-                                    self.page_title +
-                                    '&expand=body.storage.value,version.number',
-                                    auth=(self.confluence.login, self.confluence.password)
-                                    ).json()
-        self.content = self.content['results'][0]
-        self.page_value = self.content['body']['storage']['value']
-        self.content_id = self.content['id']
-        self.version = int(self.content['version']['number'])
+        if content is None:
+            content = self.confluence.get_page(self.page_title, expand)
+        self._load(content)
         self.dict_to_upload = {}
 
+    def _load(self, content):
+        self.content = content
+        self.page_value = None
+        self.version = None
+        if 'body' in self.content:
+            self.page_value = self.content['body']['storage']['value']
+        if 'version' in self.content:
+            self.version = int(self.content['version']['number'])
+        self.content_id = self.content['id']
+        # the value on confluence, the page is not put if it was not changed
+        self._uploaded_value = self.page_value
+
+    def refresh(self):
+        """fetch the current version of the page, changes which were not put are lost"""
+        self._load(self.confluence.get_page(self.page_title))
+
+    @property
+    def space_key(self):
+        if 'space' in self.content:
+            return self.content['space']['key']
+        return self.content['_expandable']['space'].split('/')[-1]
+
     def _prepare_dict_to_upload(self):
         self.dict_to_upload = {
                               'version': {'number': str(self.version + 1)},
@@ -135,223 +734,618 @@ class Page:
                                   }
                               }
 
+    def iter_childs(self, expand=''):
+        """yields json of every child page with the expand fields"""
+        return self.confluence.iter_children(self.content_id, expand)
+
     def get_childs(self):
-        """returns a list with child id's"""
-        get_request = self.confluence.url + '/rest/api/content/search?cql=parent=' + self.content_id
-        get_response = requests.get(get_request, auth=(self.confluence.login, self.confluence.password))
-        childs_data = get_response.json()['results']
-        childs = []
-        for child in childs_data:
-            #childs.update({child['id']: child['title']})
-            childs.append(child['title'])
-        return childs
+        """returns a list with child titles"""
+        return [child['title'] for child in self.iter_childs()]
 
     def set_perms(self, operation, pattern):
         """set permissions for a condluence page by xml pattern"""
-        page_perms_response = self.confluence.xmlrpc_proxy.confluence2.setContentPermissions(
-                                                                                        self.confluence.xmlrpc_token,
-                                                                                        self.content_id,
-                                                                                        operation,
-                                                                                        pattern
+        page_perms_response = self.confluence.xmlrpc_call(
+                                                        'setContentPermissions',
+                                                        self.content_id,
+                                                        operation,
+                                                        pattern
         )
         return page_perms_response
 
-    def update(self):
-        """put the current version of content to confluience"""
-        self._prepare_dict_to_upload()
-        request_data = json.dumps(self.dict_to_upload)
-        put_response = requests.put(
-                                    self.confluence.url + '/rest/api/content/' + self.content_id,
-                                    auth=(self.confluence.login, self.confluence.password),
-                                    data=request_data,
-                                    headers = {
-                                            'Content-Type' : 'application/json',
-                                            'Accept' : 'application/json'
-                                    }
-        )
+    def update(self, reapply=None, conflict_retries=3, backoff=0.5):
+        """put the current version of content to confluience.
+        returns None without a request if the page value is the same as on confluence.
+        if somebody has changed the page meanwhile(409 conflict) the page is fetched again,
+        reapply() should make the changes again on the new page value, then the update is retried with backoff.
+        without reapply the 409 response is returned"""
+        attempt = 0
+        while True:
+            if self.page_value == self._uploaded_value:
+                return None
+            self._prepare_dict_to_upload()
+            request_data = json.dumps(self.dict_to_upload)
+            put_response = self.confluence.put(
+                                        '/rest/api/content/' + self.content_id,
+                                        data=request_data,
+                                        headers = {
+                                                'Content-Type' : 'application/json',
+                                                'Accept' : 'application/json'
+                                        }
+            )
+            if put_response.status_code != 409 or reapply is None or attempt >= conflict_retries:
+                break
+            time.sleep(backoff * 2 ** attempt)
+            attempt = attempt + 1
+            self.refresh()
+            reapply()
+        if put_response.ok:
+            self.version = self.version + 1
+            self.content = dict(
+                                self.content,
+                                version={'number': self.version},
+                                body={'storage': {'value': self.page_value, 'representation': 'storage'}}
+            )
+            self._uploaded_value = self.page_value
+            if self.confluence.cache is not None:
+                self.confluence.cache.put(self.content)
         return put_response
 
 
+class ScheduleRow:
+    """a row of the schedule table: the markup of its cells and the values parsed from them.
+    columns: prod date, moved prod date, finalize date, product, link to the release page, type, status"""
+
+    __slots__ = ('cells', 'prod_date', 'prod_date_moved', 'finalize_date', 'product', 'release_title',
+                 'release_type', 'status', 'changed', 'span', 'space_key')
+
+    def __init__(self, cells, prod_date='', prod_date_moved='', finalize_date='', product='', release_title=None,
+                 release_type='', status='', changed=False, span=None, space_key=None):
+        self.cells = cells
+        self.prod_date = prod_date
+        self.prod_date_moved = prod_date_moved
+        self.finalize_date = finalize_date
+        self.product = product
+        self.release_title = release_title
+        self.release_type = release_type
+        self.status = status
+        self.changed = changed
+        # (start, end) of the row markup in the page value, None for rows which are not on the page yet
+        self.span = span
+        # space of the release page if the link has it, it's missing when the page is in the schedule space
+        self.space_key = space_key
+
+    @classmethod
+    def from_tag(cls, tr, page_value=None, line_starts=None):
+        """the row from a bs4 tr tag, the tag is not kept.
+        if the page value and offsets of its lines are given, the cells keep the original markup
+        and the row knows where it is in the page value"""
+        tds = tr.find_all('td')
+        row = cls([str(td) for td in tds])
+        if page_value is not None and tr.sourceline is not None:
+            start = line_starts[tr.sourceline - 1] + tr.sourcepos
+            cells = []
+            cell_end = start
+            for td in tds:
+                cell_start = line_starts[td.sourceline - 1] + td.sourcepos
+                cell_end = page_value.find('</td>', cell_start) + len('</td>')
+                cells.append(page_value[cell_start:cell_end])
+            end = page_value.find('</tr>', cell_end) + len('</tr>')
+            if page_value.startswith('<tr', start) and end >= cell_end + len('</tr>'):
+                row.cells = cells
+                row.span = (start, end)
+        texts = [td.get_text() for td in tds[:7]]
+        texts = texts + [''] * (7 - len(texts))
+        row.prod_date, row.prod_date_moved, row.finalize_date, row.product = texts[:4]
+        row.release_type, row.status = texts[5:7]
+        if len(tds) > 4:
+            link = tds[4].find('ri:page')
+            if link is not None:
+                row.release_title = link.get('ri:content-title')
+                row.space_key = link.get('ri:space-key')
+        return row
+
+    @classmethod
+    def from_release(cls, release, product):
+        """a new row for the release, the dates are in the schedule format"""
+        date_prod, date_prod_moved, date_finalize = ParsedDate.convert(
+            [(src_date, release.year) for src_date in (release.date_prod, release.date_prod_moved or '',
+                                                       release.date_finalize)],
+            'schedule'
+        )
+        cells = [
+            '<td colspan="1">' + date_prod + '</td>',
+            '<td colspan="1">' + date_prod_moved + '</td>',
+            '<td colspan="1">' + date_finalize + '</td>',
+            '<td colspan="1">' + product + '</td>',
+            '<td colspan="1"><ac:link><ri:page ri:content-title="' + release.release_page +
+            '"></ri:page><ac:plain-text-link-body><![CDATA[' + release.release_ver +
+            ']]></ac:plain-text-link-body></ac:link></td>',
+            '<td colspan="1">' + release.type + '</td>',
+            '<td colspan="1"><strong>' + release.status + '</strong></td>',
+            '<td colspan="1"><br/></td>',
+            '<td colspan="1"><br/></td>'
+        ]
+        return cls(cells, date_prod, date_prod_moved, date_finalize, product, release.release_page,
+                   release.type, release.status, changed=True, space_key=release.relpage.space_key)
+
+    def set_dates_and_status(self, prod_date, prod_date_moved, finalize_date, status):
+        self.prod_date = prod_date
+        self.prod_date_moved = prod_date_moved
+        self.finalize_date = finalize_date
+        self.status = status
+        self.cells[0] = '<td colspan="1"><span>' + prod_date + '</span></td>'
+        self.cells[1] = '<td colspan="1"><span>' + prod_date_moved + '</span></td>'
+        self.cells[2] = '<td colspan="1"><span>' + finalize_date + '</span></td>'
+        self.cells[6] = '<td colspan="1"><strong>' + status + '</strong></td>'
+        self.changed = True
+
+    def to_markup(self):
+        return '<tr>' + ''.join(self.cells) + '</tr>'
+
+
 class Schedule(Page):
-    """the class allow updating the release schedule in confluence"""
-
-    def __init__(self, page_title, confluence):
-        super().__init__(page_title, confluence)
-        self.table = []
-        self.product_ru_en_dict = {
-            'akeos': 'АКЕОС',
-            'armcpok': 'АРМЦПОК',
-            'csvc': 'КУ',
-            'esia': 'ЕСИА',
-            'esnsi(2.0)': 'ЕСНСИ2',
-            'esnsi': 'ЕСНСИ',
-            'geps': 'ГЕПС',
-            'gosbar': 'ГосБар',
-            'invest-portal': 'Инвест Портал',
-            'ipsh': 'ИПШ',
-            'nsmev': 'НСМЭВ',
-            'op': 'Открытая Платформа',
-            'pgp': 'ПГП',
-            'pgu': 'ПГУ',
-            'pso': 'ПСО',
-            'rc': 'РЦ',
-            'rsa': 'РСА',
-            'sir': 'СИР',
-            'skuf': 'СКУФ',
-            'smev': 'СМЭВ',
-            'smev-ktda': 'СМЭВ КТДА',
-            'ssfo-duus2': 'ССФО-ДУУС 2',
-            'amsir': 'Автономные модули',
-            'guides': 'Интерактивный Гайд',
-            'ifc': 'ИФЦ',
-            'ivp': 'ИВП',
-            'sedo': 'СЭДО',
-        }
-        self.changes_counter = 0
-        self.add_release = None
+    """the class allow updating the release schedule in confluence
+    rows - list of ScheduleRow in the table order, index - the same rows by release page title
+    workers - how many release pages are fetched and parsed at the same time
+    splice - put only changed and added rows into the page value and leave the rest of it as it is,
+    otherwise the whole table is built again
+    release_index - ReleaseIndex, if it's set the rows are updated from it and only the release pages
+    which are not in the index are requested"""
+
+    def __init__(self, page_title, confluence, workers=8, splice=True, release_index=None):
+        with confluence.phase('schedule_init'):
+            super().__init__(page_title, confluence)
+            self.workers = workers
+            self.splice = splice
+            self.release_index = release_index
+            self.errors = []
+            self.product_ru_en_dict = {
+                'akeos': 'АКЕОС',
+                'armcpok': 'АРМЦПОК',
+                'csvc': 'КУ',
+                'esia': 'ЕСИА',
+                'esnsi(2.0)': 'ЕСНСИ2',
+                'esnsi': 'ЕСНСИ',
+                'geps': 'ГЕПС',
+                'gosbar': 'ГосБар',
+                'invest-portal': 'Инвест Портал',
+                'ipsh': 'ИПШ',
+                'nsmev': 'НСМЭВ',
+                'op': 'Открытая Платформа',
+                'pgp': 'ПГП',
+                'pgu': 'ПГУ',
+                'pso': 'ПСО',
+                'rc': 'РЦ',
+                'rsa': 'РСА',
+                'sir': 'СИР',
+                'skuf': 'СКУФ',
+                'smev': 'СМЭВ',
+                'smev-ktda': 'СМЭВ КТДА',
+                'ssfo-duus2': 'ССФО-ДУУС 2',
+                'amsir': 'Автономные модули',
+                'guides': 'Интерактивный Гайд',
+                'ifc': 'ИФЦ',
+                'ivp': 'ИВП',
+                'sedo': 'СЭДО',
+            }
+            self.changes_counter = 0
+            self.add_release = None
+            # changes made by the object, they are made again if the page is changed by somebody else meanwhile
+            self._pending_updates = {}
+            self._pending_adds = []
+            self._pending_removals = set()
+            self._parse_rows()
+
+    def _parse_rows(self):
+        from bs4 import BeautifulSoup
+        self.rows = []
+        self.index = {}
+        self._removed_rows = []
         soup = BeautifulSoup(self.page_value, 'html.parser')
         rows = soup.find_all('tr')
         self.top = rows[0]
+        line_starts = [0]
+        for line in self.page_value.split('\n'):
+            line_starts.append(line_starts[-1] + len(line) + 1)
+        # the rows can be spliced only if all of them were found in the page value
+        self._spliceable = self.top.sourceline is not None
+        if self._spliceable:
+            top_start = line_starts[self.top.sourceline - 1] + self.top.sourcepos
+            self._table_end = self.page_value.find('</tr>', top_start) + len('</tr>')
         rows_iter = iter(rows)
         next(rows_iter)
         for row in rows_iter:
-            self.table.append(row.find_all('td'))
-
-    def _update_release_table(self):
-        """update data in release table by release pages"""
-
-        for num, row in enumerate(self.table):
-            if 'PROD' not in str(row[6]):
-                relpage_title = re.search('content-title="(.*)">', str(row[4])).group(1)
-                release = Release(relpage_title, self.confluence)
-                prod_date_table = re.search('>([\w|\W|\d|\s]*)<', str(row[0])).group(1)
-                status_table = re.search('<strong>([\w|\W]*)</strong>', str(row[6])).group(1)
-                date_prod_moved_table = re.search('>([\w|\W|\d|\s]*)<', str(row[1])).group(1)
-                finalize_date_table = re.search('>([\w|\W|\d|\s]*)<', str(row[2])).group(1)
-                prod_date_page = ReleaseDate(release.date_prod, release.year).to_schedule()
-                if release.date_prod_moved is not '':
-                    prod_date_moved_page = ReleaseDate(release.date_prod_moved, release.year).to_schedule()
-                else:
-                    prod_date_moved_page = release.date_prod_moved
-                finalize_date_page = ReleaseDate(release.date_finalize, release.year).to_schedule()
-                if prod_date_table.count(prod_date_page) == 0 \
-                        or status_table != release.status\
-                        or finalize_date_table.count(finalize_date_page) == 0\
-                        or date_prod_moved_table.count(prod_date_moved_page) == 0:
-                    self.changes_counter = self.changes_counter + 1
-                # build rows in table with parsed data
-                    row[0] = '<td colspan="1"><span>' + prod_date_page + '</span></td>'
-                    row[1] = '<td colspan="1"><span>' + prod_date_moved_page + '</span></td>'
-                    row[2] = '<td colspan="1"><span>' + finalize_date_page + '</span></td>'
-                    row[6] = '<td colspan="1"><strong>' + release.status + '</strong></td>'
+            row = ScheduleRow.from_tag(row, self.page_value, line_starts)
+            if row.span is None:
+                self._spliceable = False
+            else:
+                self._table_end = row.span[1]
+            self._append_row(row)
+
+    def _append_row(self, row):
+        self.rows.append(row)
+        if row.release_title is not None:
+            self.index.setdefault(row.release_title, row)
+
+    def _fetch_releases(self, titles):
+        """load release pages by bulk cql searches, the pages which were not found by the search
+        are fetched one by one concurrently, returns a dict title -> Release or exception"""
+        def fetch(title):
+            try:
+                return Release(title, self.confluence)
+            except Exception as e:
+                return e
+
+        indexed = {}
+        if self.release_index is not None:
+            indexed = self.release_index.releases(titles)
+            titles = [title for title in titles if title not in indexed]
+        try:
+            releases = self.confluence.load_releases(titles, workers=self.workers)
+        except Exception as e:
+            print('WARN: bulk loading of release pages failed, loading them one by one:', e)
+            releases = {}
+        missing = [title for title in titles if title not in releases]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            releases.update(zip(missing, executor.map(fetch, missing)))
+        if self.release_index is not None:
+            self.release_index.upsert(release for release in releases.values() if isinstance(release, Release))
+        releases.update(indexed)
+        return releases
+
+    def _update_release_table(self, titles=None):
+        """update data in release table by release pages, only the rows of the titles if they are given"""
+
+        with self.confluence.phase('update_release_table'):
+            self.errors = []
+            open_rows = []
+            for num, row in enumerate(self.rows):
+                if titles is not None and row.release_title not in titles:
+                    continue
+                if 'PROD' not in row.status:
+                    if row.release_title is None:
+                        self.errors.append((num, None, 'the row has no link to a release page'))
+                        continue
+                    open_rows.append((num, row))
+            releases = self._fetch_releases(list(dict.fromkeys(row.release_title for num, row in open_rows)))
+            # the dates of all the rows are converted by one call, releases of different years are in the column
+            column = []
+            for num, row in open_rows:
+                release = releases[row.release_title]
+                if not isinstance(release, Exception):
+                    column.extend((src_date, release.year) for src_date in (
+                        release.date_prod, release.date_prod_moved, release.date_finalize
+                    ))
+            dates = iter(ParsedDate.convert(column, 'schedule', errors='keep'))
+            # rows are updated in the table order whatever order the pages were fetched in
+            for num, row in open_rows:
+                release = releases[row.release_title]
+                if isinstance(release, Exception):
+                    self.errors.append((num, row.release_title, release))
+                    continue
+                row_dates = [next(dates), next(dates), next(dates)]
+                failed = [row_date for row_date in row_dates if isinstance(row_date, Exception)]
+                if failed:
+                    self.errors.append((num, row.release_title, failed[0]))
+                    continue
+                try:
+                    self._update_row(row, release, row_dates)
+                except Exception as e:
+                    self.errors.append((num, row.release_title, e))
+            for num, relpage_title, error in self.errors:
+                print('WARN: row', num + 1, 'of the schedule was not updated:', relpage_title, error)
+
+    def _update_row(self, row, release, dates):
+        """compare the row with the release page and rebuild changed cells,
+        dates - prod, moved prod and finalize dates of the release in the schedule format"""
+        prod_date_page, prod_date_moved_page, finalize_date_page = dates
+        if prod_date_page not in row.prod_date \
+                or row.status != release.status \
+                or finalize_date_page not in row.finalize_date \
+                or prod_date_moved_page not in row.prod_date_moved:
+            self.changes_counter = self.changes_counter + 1
+            # build rows in table with parsed data
+            row.set_dates_and_status(prod_date_page, prod_date_moved_page, finalize_date_page, release.status)
+            self._pending_updates[row.release_title] = (
+                prod_date_page, prod_date_moved_page, finalize_date_page, release.status
+            )
 
     def add_release_to_schedule(self, release):
         """add the row to schedule table(need to updating schedule to upload)"""
-        release = Release(release, self.confluence)
-        self.add_release = release.release_page
-        if self.add_release in str(self.table):
+        if release in self.index:
             print('WARN: the release already added to the release schedule')
-            self.add_release = None
             return False
-        new_row_pattern = '<td colspan="1">пн, 10-сен</td>, <td colspan="1">пн, 10-сен</td>, <td colspan="1">' \
-                          'пн, 10-сен</td>, <td colspan="1">ПГУ</td>, <td colspan="1"><ac:link>' \
-                  '<ri:page ri:content-title="PGU-Release-3.0.229.1-rpguservices"></ri:page><ac:plain-text-link-body>' \
-                  '<![CDATA[3.0.229.1-rpguservices]]></ac:plain-text-link-body></ac:link></td>, <td colspan="1">' \
-                  'Плановый</td>, <td colspan="1"><strong>PROD</strong></td>, <td colspan="1"><br/></td>, ' \
-                  '<td colspan="1"><br/></td>'
-        soup = BeautifulSoup(new_row_pattern, 'html.parser')
-        new_line = soup.find_all('td')
-        release = Release(release.release_page, self.confluence)
-        date_finalize = ReleaseDate(release.date_finalize, release.year).to_schedule()
-        date_prod = ReleaseDate(release.date_prod, release.year).to_schedule()
-        date_prod_moved = ""
+        release = Release(release, self.confluence)
+        self.add_release = release.release_page
         try:
             _product_ru = self.product_ru_en_dict[release.product.lower()]
-        except:
+        except KeyError:
             _product_ru = 'UNKNOWN PRODUCT'
-        new_line[0] = '<td colspan="1">' + date_prod + '</td>'
-        if release.date_prod_moved is not None:
-            date_prod_moved = ReleaseDate(release.date_prod_moved, release.year).to_schedule()
-            new_line[1] = '<td colspan="1">' + date_prod_moved + '</td>'
+        row = ScheduleRow.from_release(release, _product_ru)
+        self._append_row(row)
+        self._pending_adds.append(row)
+
+    def update_schedule_page(self, titles=None):
+        """compile results to dict and put to confluence, returns None if there is nothing to update.
+        titles - update only the rows of these release pages, the other release pages are not requested"""
+
+        with self.confluence.phase('update_schedule_page'):
+            self._update_release_table(titles)
+            if self.changes_counter == 0 and self.add_release is None and not self._removed_rows:
+                print('OK: No changes found on release pages. No need to update the Schedule.')
+                return None
+            self._serialize()
+            put_response = self.update(reapply=self._reapply_changes)
+            if put_response is None:
+                print('OK: The schedule page has not changed. No need to update it.')
+            if put_response is None or put_response.ok:
+                self._pending_updates = {}
+                self._pending_adds = []
+                self._pending_removals = set()
+            self.add_release = None
+            return put_response
+
+    def _serialize(self):
+        if self.splice and self._spliceable:
+            self._splice_page_value()
         else:
-            new_line[1] = '<td colspan="1"></td>'
-        new_line[2] = '<td colspan="1">' + date_finalize + '</td>'
-        new_line[3] = '<td colspan="1">' + _product_ru + '</td>'
-        new_line[4] = '<td colspan="1"><ac:link><ri:page ri:content-title="' + \
-                      release.release_page + \
-                      '"></ri:page><ac:plain-text-link-body><![CDATA[' + \
-                      release.release_ver + \
-                      ']]></ac:plain-text-link-body></ac:link></td>'
-        new_line[5] = '<td colspan="1">' + release.type + '</td>'
-        new_line[6] = '<td colspan="1"><strong>' + release.status + '</strong></td>'
-        self.table.append(new_line)
-
-
-    def update_schedule_page(self):
-        """compile results to dict and put to confluence"""
-
-        self._update_release_table()
-        if self.changes_counter is 0 and self.add_release is None:
-            print('OK: No changes found on release pages. No need to update the Schedule.')
-            exit(0)
+            self._rebuild_page_value()
+
+    def _reapply_changes(self):
+        """parse the schedule fetched after a version conflict and make the changes of the object again"""
+        self._parse_rows()
+        for title, values in self._pending_updates.items():
+            row = self.index.get(title)
+            if row is not None and (row.prod_date, row.prod_date_moved, row.finalize_date, row.status) != values:
+                row.set_dates_and_status(*values)
+        for row in self._pending_adds:
+            if row.release_title not in self.index:
+                row.span = None
+                row.changed = True
+                self._append_row(row)
+        for title in self._pending_removals:
+            row = self.index.pop(title, None)
+            if row is not None:
+                self.rows.remove(row)
+                if row.span is not None:
+                    self._removed_rows.append(row)
+        self._serialize()
+
+    @staticmethod
+    def _row_date(row, year):
+        """the date the row went to prod in the year"""
+        matches = re.search(r'(\d\d)/(\d\d)', row.prod_date_moved) or re.search(r'(\d\d)/(\d\d)', row.prod_date)
+        if matches is None:
+            return None
+        try:
+            return date(year, int(matches.group(1)), int(matches.group(2)))
+        except ValueError:
+            return None
+
+    def _row_years(self, rows):
+        """returns a dict id(row) -> year taken like Release.year from the space key of the release page,
+        the space is requested by one search for the links without ri:space-key.
+        rows which year can't be found are missing"""
+        titles = [row.release_title for row in rows if row.space_key is None and row.release_title is not None]
+        spaces = {}
+        if titles:
+            spaces = self.confluence.page_spaces(titles, workers=self.workers)
+        years = {}
+        for row in rows:
+            space_key = row.space_key or spaces.get(row.release_title)
+            if space_key is not None and space_key[-4:].isdigit():
+                years[id(row)] = int(space_key[-4:])
+        return years
+
+    def archive_prod_rows(self, max_age_days, period='year', today=None):
+        """move PROD rows older than max_age_days to archive child pages of the schedule,
+        an archive page per year or per quarter(period='quarter') is created when it's needed.
+        the table has no years, the year of a row is the year of the space of its release page,
+        rows which year can't be found are left in the schedule.
+        rows are removed from the schedule only after their archive page was saved,
+        the schedule should be updated after that. returns how many rows were archived"""
+        today = today or date.today()
+        prod_rows = [row for row in self.rows if 'PROD' in row.status]
+        years = self._row_years(prod_rows)
+        periods = {}
+        unknown = 0
+        for row in prod_rows:
+            row_date = None
+            if id(row) in years:
+                row_date = self._row_date(row, years[id(row)])
+            if row_date is None:
+                unknown = unknown + 1
+                continue
+            if (today - row_date).days <= max_age_days:
+                continue
+            period_key = str(row_date.year)
+            if period == 'quarter':
+                period_key = period_key + '-Q' + str((row_date.month - 1) // 3 + 1)
+            periods.setdefault(period_key, []).append(row)
+        if unknown:
+            print('WARN:', unknown, 'PROD rows were not archived, their year or date is unknown.')
+
+        archived = 0
+        for period_key, rows in sorted(periods.items()):
+            title = self.page_title + ' archive ' + period_key
+            try:
+                resp = self._save_archive_page(title, rows)
+                saved = resp is None or resp.ok
+            except Exception as e:
+                resp = e
+                saved = False
+            if not saved:
+                print('FAILED: rows were not moved to the archive page', title, resp)
+                continue
+            archived_rows = set(map(id, rows))
+            self.rows = [row for row in self.rows if id(row) not in archived_rows]
+            for row in rows:
+                if self.index.get(row.release_title) is row:
+                    del self.index[row.release_title]
+                    self._pending_removals.add(row.release_title)
+                if row.span is not None:
+                    self._removed_rows.append(row)
+            archived = archived + len(rows)
+        return archived
+
+    def _save_archive_page(self, title, rows):
+        """append the rows to the archive page or create it, rows which are on the page already are skipped.
+        returns the response or None if all the rows are on the page already"""
+        content = self.confluence.find_page(title, self.space_key)
+        if content is None:
+            table = '<table><tbody>' + str(self.top) + ''.join([row.to_markup() for row in rows]) + '</tbody></table>'
+            return self.confluence.create_page(title, self.space_key, self.content_id, table)
+        archive = Page(title, self.confluence, content)
+        markup = ''.join([
+                         row.to_markup() for row in rows
+                         if row.release_title is None
+                         or 'ri:content-title="' + row.release_title + '"' not in archive.page_value
+        ])
+        if not markup:
+            return None
+        table_end = archive.page_value.rfind('</tbody>')
+        if table_end == -1:
+            raise ValueError('the archive page ' + title + ' has no table to append the rows to')
+        archive.page_value = archive.page_value[:table_end] + markup + archive.page_value[table_end:]
+        return archive.update()
+
+    def _rebuild_page_value(self):
+        """build the whole table again from the rows"""
         before_table = re.search('(.*<tbody>)<tr>', self.page_value).groups(1)[0]
         after_table = '</tbody></table></ac:rich-text-body></ac:structured-macro>'
-        table = ''
         # generate dict-json to put to confluence
-        for row in self.table:
-            columns = ''
-            for column in row:
-                columns = columns + (str(column))
-            table = table + '<tr>' + columns + '</tr>'
+        table = ''.join([row.to_markup() for row in self.rows])
         self.page_value = before_table + str(self.top) + table + after_table
-        put_response = self.update()
-        self.add_release = None
-        return put_response
+        self._spliceable = False
+        self._removed_rows = []
+
+    def _splice_page_value(self):
+        """replace the markup of changed rows by their offsets, cut archived rows out
+        and insert added rows after the last row, every other byte of the page value is left as it is.
+        spans of the rows are moved to the new value"""
+        pieces = []
+        position = 0
+        length = 0
+        removed = set(map(id, self._removed_rows))
+        spanned = sorted([row for row in self.rows if row.span is not None] + self._removed_rows,
+                         key=lambda row: row.span[0])
+        for row in spanned:
+            start, end = row.span
+            if id(row) in removed:
+                markup = ''
+            elif row.changed:
+                markup = row.to_markup()
+            else:
+                markup = self.page_value[start:end]
+            pieces.append(self.page_value[position:start])
+            length = length + start - position
+            pieces.append(markup)
+            row.span = (length, length + len(markup))
+            length = length + len(markup)
+            row.changed = False
+            position = end
+        # added rows go right after the last row of the table
+        pieces.append(self.page_value[position:self._table_end])
+        length = length + self._table_end - position
+        for row in self.rows:
+            if row.span is None:
+                markup = row.to_markup()
+                pieces.append(markup)
+                row.span = (length, length + len(markup))
+                length = length + len(markup)
+                row.changed = False
+        pieces.append(self.page_value[self._table_end:])
+        self._table_end = length
+        self._removed_rows = []
+        self.page_value = ''.join(pieces)
+
+
+class ReleasePageParser:
+    """extracts release fields from the storage value of a release page in one pass over its list items.
+    only the items with the fields are matched by the precompiled patterns, so parsing time grows
+    linearly with the size of the page whatever long the checklists are"""
+
+    _item_re = re.compile(r'<li>(.*?</li>)', re.S)
+    _status_re = re.compile(r'Статус:[&nbsp;\s]*<strong>(.*?)</strong></li>', re.S)
+    _type_re = re.compile(r'Тип релиза:[&nbsp;\s]*[<strong>]*(\w*?)<')
+    _last_date_re = re.compile(r'.*(\d\d\s\w*)', re.S)
+    _product_re = re.compile(r'(.*)-[r|R]elease', re.S)
+    _release_ver_re = re.compile(r'[R|r]elease[s]*-(.*)', re.S)
+
+    @classmethod
+    def _last_date(cls, text):
+        matches = cls._last_date_re.match(text)
+        if matches is None:
+            return None
+        return matches.group(1)
+
+    @classmethod
+    def parse_title(cls, title):
+        """returns product and release version from a release page title"""
+        return cls._product_re.search(title).group(1), cls._release_ver_re.search(title).group(1)
+
+    @classmethod
+    def parse(cls, page_value):
+        """returns a dict with status, type, date_prod, date_prod_moved, date_finalize, date_finalize_moved"""
+        status = None
+        release_type = None
+        prod_item = None
+        finalize_item = None
+        for matches in cls._item_re.finditer(page_value):
+            item = matches.group(1)
+            if status is None and 'Статус:' in item:
+                status_matches = cls._status_re.search(item)
+                if status_matches:
+                    status = status_matches.group(1)
+            elif release_type is None and 'Тип релиза:' in item:
+                type_matches = cls._type_re.search(item)
+                if type_matches:
+                    release_type = type_matches.group(1)
+            elif finalize_item is None and item.startswith('Финализация'):
+                finalize_item = item
+                if status is not None and release_type is not None and prod_item is not None:
+                    break
+            elif finalize_item is None and 'продуктив' in item:
+                # the last one before the finalization item is the date of installing
+                prod_item = item
+        if status is None or release_type is None or prod_item is None or finalize_item is None:
+            raise ValueError('status, type or dates were not found on the release page')
+
+        fields = {'status': status, 'type': release_type, 'date_prod_moved': '', 'date_finalize_moved': ''}
+        fields['date_finalize'] = cls._last_date(finalize_item)
+        if '<s>' in finalize_item and 'енесено' in finalize_item:
+            fields['date_finalize_moved'] = True
+        if '<s>' in prod_item and 'енесено' in prod_item and '</s>' in prod_item:
+            fields['date_prod'] = cls._last_date(prod_item[prod_item.index('<s>'):prod_item.rindex('</s>')])
+            fields['date_prod_moved'] = cls._last_date(prod_item[prod_item.rindex('</s>'):])
+        else:
+            fields['date_prod'] = cls._last_date(prod_item)
+        if fields['date_prod'] is None or fields['date_finalize'] is None or fields['date_prod_moved'] is None:
+            raise ValueError('dates of installing to prod or finalizing were not found on the release page')
+        return fields
 
 
 class Release:
     """object contents changable parsed elements from release page and allow change them"""
-    def __init__(self, relpage, confluence):
+    def __init__(self, relpage, confluence, content=None):
         self.release_page = relpage
-        self.relpage = Page(relpage, confluence)
-        self.status = re.search(
-                                'Статус:[&nbsp;\s]*<strong>([\w|\W|\d|\s]*?)</strong></li>',
-                                self.relpage.page_value
-                                ).group(1)
-        self.year = self.relpage.content['_expandable']['space'][-4:]
-        self.product = re.search('([\w\W\d\D\s]*)-[r|R]elease', self.release_page).group(1)
-        self.release_ver = re.search('[R|r]elease[s]*-([\w\W\d\D\s]*)', self.release_page).group(1)
-        self.type = re.search(
-                                r'Тип релиза:[&nbsp;\s]*[<strong>]*(\w*?)<[/strong></li></ul><ul><li>Установка]*',
-                                self.relpage.page_value
-                             ).group(1)
-        self.date_prod_moved = ''
-        self.date_finalize_moved = ''
-        if re.search('<li>Финализация.*<s>.*енесено.*тест', self.relpage.page_value):
-            self.date_finalize = re.search(
-                                        '<li>Финализация.*еренесено.*(\d\d\s\w*).*</li><li>.*Завершение',
-                                        self.relpage.page_value
-                                        ).group(1)
-            self.date_finalize_moved = True
-        else:
-            self.date_finalize = re.search(
-                                            '<li>Финализация.*(\d\d\s\w*).*</li><li>.*Завершение',
-                                            self.relpage.page_value
-                                        ).group(1)
-
-        if re.search('<li>.*продуктив.*<s>.*енесено.*инали', self.relpage.page_value):
-            matches = re.search(
-                                '<li>.*продуктив.*<s>.*(\d\d\s\w*).*</s>.*еренесено на.*(\d\d\s\w*).*</li><li>.*Финал',
-                                self.relpage.page_value
-                                )
-            self.date_prod = matches.group(1)
-            self.date_prod_moved = matches.group(2)
-        else:
-            self.date_prod = re.search('<li>.*продуктив.*(\d\d\s\w*).*</li><li>.*Финал', self.relpage.page_value).group(1)
+        self.relpage = Page(relpage, confluence, content)
+        self.year = self.relpage.space_key[-4:]
+        self.product, self.release_ver = ReleasePageParser.parse_title(self.release_page)
+        self._parse()
 
+    def _parse(self):
+        with self.relpage.confluence.phase('release_parse'):
+            fields = ReleasePageParser.parse(self.relpage.page_value)
+        self.status = fields['status']
+        self.type = fields['type']
+        self.date_prod = fields['date_prod']
+        self.date_prod_moved = fields['date_prod_moved']
+        self.date_finalize = fields['date_finalize']
+        self.date_finalize_moved = fields['date_finalize_moved']
 
     def move_date_prod(self, date):
-        new_date = ReleaseDate(date, self.year).to_relpage()
+        new_date = ParsedDate.parse(date, self.year).to_relpage()
         if self.date_prod_moved:
             src_regexp = r'перенесено на: \d\d\s\w*</li><li>Финализация'
             aim_regexp = r'перенесено на: ' + new_date + '</li><li>Финализация'
@@ -364,9 +1358,10 @@ class Release:
             self.relpage.page_value = re.sub(src_regexp,
                                             aim_regexp,
                                             self.relpage.page_value)
+        self.date_prod_moved = new_date
 
     def move_date_finzlize(self, date):
-        new_date = ReleaseDate(date, self.year).to_relpage()
+        new_date = ParsedDate.parse(date, self.year).to_relpage()
         if self.date_finalize_moved:
             src_regexp = r'перенесено на: \d\d\s\w*</li><li>Завершение'
             aim_regexp = r'перенесено на: ' + new_date + '</li><li>Завершение'
@@ -379,6 +1374,8 @@ class Release:
             self.relpage.page_value = re.sub(src_regexp,
                                              aim_regexp,
                                              self.relpage.page_value)
+        self.date_finalize = new_date
+        self.date_finalize_moved = True
 
     def set_status(self, new_status):
         self.status = new_status
@@ -388,11 +1385,548 @@ class Release:
                                         aim_regexp,
                                         self.relpage.page_value)
 
+    def edit(self):
+        """start an edit session: changes are applied in memory and put with one request by commit()"""
+        return ReleaseEdit(self)
+
+
+class ReleaseRecord:
+    """release fields from ReleaseIndex, it can be used by Schedule instead of Release"""
+
+    __slots__ = ('release_page', 'content_id', 'version', 'year', 'product', 'release_ver', 'status', 'type',
+                 'date_prod', 'date_prod_moved', 'date_finalize', 'date_finalize_moved', 'prod_date', 'finalize_date')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ReleaseIndex:
+    """local sqlite index of the parsed release pages, the queries do not need confluence.
+    a page is stored with its version and is fetched again by sync only when confluence has a newer version.
+    prod_date(the moved date if the date was moved) and finalize_date are kept as yyyy-mm-dd for the queries"""
+
+    _columns = ('title', 'content_id', 'version', 'year', 'product', 'release_ver', 'status', 'type',
+                'date_prod', 'date_prod_moved', 'date_finalize', 'date_finalize_moved', 'prod_date', 'finalize_date')
+
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS releases ('
+                'title TEXT PRIMARY KEY, content_id TEXT, version INTEGER, year TEXT, product TEXT, '
+                'release_ver TEXT, status TEXT, type TEXT, date_prod TEXT, date_prod_moved TEXT, '
+                'date_finalize TEXT, date_finalize_moved INTEGER, prod_date TEXT, finalize_date TEXT)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS releases_product ON releases (product COLLATE NOCASE)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS releases_prod_date ON releases (prod_date)')
+
+    def close(self):
+        self._db.close()
+
+    @staticmethod
+    def _iso_date(relpage_date, year):
+        """'12 сентября', '2018' -> '2018-09-12', None if the date can't be read"""
+        try:
+            return ParsedDate.parse(relpage_date, year).to_date().isoformat()
+        except ValueError:
+            return None
+
+    def upsert(self, releases):
+        """store the releases, a stored page is replaced only by a newer version. returns how many were stored"""
+        records = []
+        for release in releases:
+            prod_date = release.date_prod_moved or release.date_prod
+            records.append((
+                release.release_page,
+                release.relpage.content_id,
+                release.relpage.version,
+                release.year,
+                release.product,
+                release.release_ver,
+                release.status,
+                release.type,
+                release.date_prod,
+                release.date_prod_moved,
+                release.date_finalize,
+                int(bool(release.date_finalize_moved)),
+                self._iso_date(prod_date, release.year),
+                self._iso_date(release.date_finalize, release.year),
+            ))
+        updates = ', '.join(column + ' = excluded.' + column for column in self._columns[1:])
+        with self._lock, self._db:
+            changes = self._db.total_changes
+            self._db.executemany(
+                'INSERT INTO releases (' + ', '.join(self._columns) + ') VALUES (' +
+                ', '.join('?' * len(self._columns)) + ') ON CONFLICT(title) DO UPDATE SET ' + updates +
+                ' WHERE excluded.version > releases.version',
+                records
+            )
+            return self._db.total_changes - changes
+
+    def versions(self):
+        """returns a dict title -> stored version"""
+        with self._lock:
+            return dict(self._db.execute('SELECT title, version FROM releases').fetchall())
+
+    def sync(self, confluence, titles=None, cql=None, workers=1):
+        """bring the index up to date with the release pages with the titles or found by the cql.
+        only the versions are requested first, then the bodies of the pages which are newer than the stored ones.
+        returns a dict with how many pages were checked, updated and could not be parsed"""
+        if titles is not None:
+            found = confluence.page_versions(titles, workers=workers)
+        else:
+            found = {
+                content['title']: (content['id'], int(content['version']['number']))
+                for content in confluence.iter_search(cql, expand='version')
+            }
+        stored = self.versions()
+        stale = [title for title, (content_id, version) in found.items() if stored.get(title, 0) < version]
+        releases = confluence.load_releases(stale, workers=workers)
+        failed = [title for title, release in releases.items() if isinstance(release, Exception)]
+        for title in failed:
+            print('WARN: the release page was not indexed:', title, releases[title])
+        updated = self.upsert(release for release in releases.values() if not isinstance(release, Exception))
+        return {'checked': len(found), 'updated': updated, 'failed': len(failed)}
+
+    def releases(self, titles):
+        """returns a dict title -> ReleaseRecord of the titles which are in the index"""
+        titles = list(dict.fromkeys(titles))
+        records = {}
+        with self._lock:
+            # sqlite limits the number of parameters of a query
+            for start in range(0, len(titles), 500):
+                chunk = titles[start:start + 500]
+                for row in self._db.execute(
+                        'SELECT * FROM releases WHERE title IN (' + ', '.join('?' * len(chunk)) + ')', chunk
+                ):
+                    records[row['title']] = self._record(row)
+        return records
+
+    @staticmethod
+    def _record(row):
+        fields = dict(row)
+        fields['release_page'] = fields.pop('title')
+        fields['date_finalize_moved'] = bool(fields['date_finalize_moved'])
+        return ReleaseRecord(**fields)
+
+    def query(self, product=None, status=None, prod_from=None, prod_to=None, finalize_from=None, finalize_to=None):
+        """releases matching all the given filters ordered by prod date, dates are yyyy-mm-dd and inclusive,
+        product is the code from the page title(PGU, ESIA...) in any case"""
+        conditions = []
+        params = []
+        for condition, value in (
+                ('product = ? COLLATE NOCASE', product),
+                ('status = ?', status),
+                ('prod_date >= ?', prod_from),
+                ('prod_date <= ?', prod_to),
+                ('finalize_date >= ?', finalize_from),
+                ('finalize_date <= ?', finalize_to),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        sql = 'SELECT * FROM releases'
+        if conditions:
+            sql = sql + ' WHERE ' + ' AND '.join(conditions)
+        with self._lock:
+            rows = self._db.execute(sql + ' ORDER BY prod_date, title', params).fetchall()
+        return [self._record(row) for row in rows]
+
+
+class PagePermissions:
+    """sets permissions for a page and all its descendants.
+    only ids of the pages are requested: the descendants are found by one paginated cql search,
+    the permissions are set by workers xml-rpc calls at the same time"""
+
+    def __init__(self, confluence, workers=8):
+        self.confluence = confluence
+        self.workers = workers
+
+    def descendants(self, content_id):
+        """yields (id, title) of all the pages under the page, a page of search results at a time"""
+        for content in self.confluence.iter_search('ancestor=' + content_id):
+            yield content['id'], content['title']
+
+    def apply(self, page_title, operation='Edit', pattern=None):
+        """returns a list of dicts with id, title, ok and error for the page and every descendant"""
+        if pattern is None:
+            pattern = [{"groupName": "confluence-contentmgn"}]
+        content_id = self.confluence.get_content_id(page_title)
+        # the calls for the first descendants are made while the next search pages are fetched
+        pages = itertools.chain([(content_id, page_title)], self.descendants(content_id))
+
+        def set_perms(page):
+            content_id, title = page
+            try:
+                resp = self.confluence.xmlrpc_call('setContentPermissions', content_id, operation, pattern)
+                error = None if resp is True else 'the server returned ' + repr(resp)
+            except Exception as e:
+                error = repr(e)
+            return {'id': content_id, 'title': title, 'ok': error is None, 'error': error}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(set_perms, pages))
+
+
+class ReleaseEdit:
+    """edit session of a release page, all the edits are uploaded as one new version of the page:
+        edit = release.edit()
+        edit.set_status('Финализирован').move_date_prod('20-09')
+        resp = edit.commit()
+    edits - list of (method name, args) applied to the release in the session"""
+
+    def __init__(self, release):
+        self.release = release
+        self.edits = []
+
+    def _apply(self, method, *args):
+        getattr(self.release, method)(*args)
+        self.edits.append((method, args))
+        return self
+
+    def set_status(self, new_status):
+        return self._apply('set_status', new_status)
+
+    def move_date_prod(self, date):
+        return self._apply('move_date_prod', date)
+
+    def move_date_finalize(self, date):
+        return self._apply('move_date_finzlize', date)
+
+    def commit(self):
+        """put the edited page to confluence, returns the response or None if the edits changed nothing.
+        if the page was changed by somebody else meanwhile the edits are made again on the new version"""
+        return self.release.relpage.update(reapply=self._reapply)
+
+    def _reapply(self):
+        self.release._parse()
+        for method, args in self.edits:
+            getattr(self.release, method)(*args)
+
+
+class BatchRunner:
+    """runs operations from a manifest in one process with one confluence client.
+    operations of the same page run one after another in the manifest order, different pages run in parallel,
+    schedules are updated after all the release pages. a manifest is a json or yaml list of operations
+    (or a dict with the list in 'operations'), for example:
+        - {op: set_status, page_title: PGU-Release-3.0.1, status: Финализирован}
+        - {op: move_prod_date, page_title: PGU-Release-3.0.1, date: 12-09}
+        - {op: move_finalize_date, page_title: PGU-Release-3.0.1, date: 14-09}
+        - {op: set_permissions, page_title: PGU-Release-3.0.1}
+        - {op: add_to_schedule, schedule: Release schedule, page_title: PGU-Release-3.0.1}
+        - {op: update_schedule, schedule: Release schedule}"""
+
+    page_operations = ('set_status', 'move_prod_date', 'move_finalize_date', 'set_permissions')
+    schedule_operations = ('add_to_schedule', 'update_schedule')
+
+    def __init__(self, confluence, workers=8):
+        self.confluence = confluence
+        self.workers = workers
+
+    @staticmethod
+    def load_manifest(path):
+        with open(path, encoding='utf-8') as manifest_file:
+            if path.endswith(('.yaml', '.yml')):
+                try:
+                    import yaml
+                except ImportError:
+                    raise RuntimeError('PyYAML is required to read yaml manifests')
+                manifest = yaml.safe_load(manifest_file)
+            else:
+                manifest = json.load(manifest_file)
+        if isinstance(manifest, dict):
+            manifest = manifest.get('operations', [])
+        return manifest
+
+    def run(self, operations):
+        """returns a list of results in the manifest order:
+        dicts with op, target, ok, message and seconds"""
+        results = [None] * len(operations)
+        pages = OrderedDict()
+        schedules = OrderedDict()
+        for num, operation in enumerate(operations):
+            op = operation.get('op') if isinstance(operation, dict) else None
+            if op in self.page_operations and operation.get('page_title'):
+                pages.setdefault(operation['page_title'], []).append((num, operation))
+            elif op in self.schedule_operations and operation.get('schedule'):
+                schedules.setdefault(operation['schedule'], []).append((num, operation))
+            else:
+                results[num] = self._result(operation, False, 'unknown operation or its target is missing', 0)
+
+        for group_runner, groups in ((self._run_page, pages), (self._run_schedule, schedules)):
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for group_results in executor.map(lambda group: group_runner(*group), groups.items()):
+                    for num, result in group_results:
+                        results[num] = result
+        return results
+
+    @staticmethod
+    def _result(operation, ok, message, seconds):
+        if not isinstance(operation, dict):
+            operation = {'op': None}
+        return {
+            'op': operation.get('op'),
+            'target': operation.get('schedule') or operation.get('page_title'),
+            'ok': ok,
+            'message': message,
+            'seconds': round(seconds, 3)
+        }
+
+    def _run_page(self, page_title, operations):
+        """the page is fetched once and all its edits are put with one request"""
+        started = time.monotonic()
+        outcomes = {}
+        edited = []
+        edit = None
+        for num, operation in operations:
+            try:
+                if operation['op'] == 'set_permissions':
+                    outcomes[num] = self._set_permissions(page_title, operation)
+                    continue
+                if edit is None:
+                    edit = Release(page_title, self.confluence).edit()
+                if operation['op'] == 'set_status':
+                    edit.set_status(operation.get('status', 'Финализирован'))
+                elif operation['op'] == 'move_prod_date':
+                    edit.move_date_prod(operation['date'])
+                elif operation['op'] == 'move_finalize_date':
+                    edit.move_date_finalize(operation['date'])
+                edited.append(num)
+            except Exception as e:
+                outcomes[num] = (False, repr(e))
+        if edited:
+            try:
+                resp = edit.commit()
+                if resp is None:
+                    commit = (True, 'the release page already has these values')
+                elif resp.ok:
+                    commit = (True, 'the release page was updated with ' + str(len(edit.edits)) + ' edits')
+                else:
+                    commit = (False, 'HTTP Error: ' + str(resp.status_code) + ' ' + resp.text)
+            except Exception as e:
+                commit = (False, repr(e))
+            for num in edited:
+                outcomes[num] = commit
+        seconds = time.monotonic() - started
+        return [(num, self._result(operation, outcomes[num][0], outcomes[num][1], seconds))
+                for num, operation in operations]
+
+    def _set_permissions(self, page_title, operation):
+        results = PagePermissions(self.confluence, self.workers).apply(
+                                page_title,
+                                operation.get('operation', 'Edit'),
+                                operation.get('pattern', [{"groupName": "confluence-contentmgn"}])
+        )
+        failed = [result['title'] for result in results if not result['ok']]
+        if failed:
+            return False, 'permissions were not set for ' + ', '.join(failed)
+        return True, 'permissions were set for ' + str(len(results)) + ' pages'
+
+    def _run_schedule(self, schedule_title, operations):
+        started = time.monotonic()
+        try:
+            schedule = Schedule(schedule_title, self.confluence, self.workers)
+        except Exception as e:
+            return [(num, self._result(operation, False, repr(e), time.monotonic() - started))
+                    for num, operation in operations]
+        results = []
+        for num, operation in operations:
+            if operation['op'] == 'add_to_schedule':
+                try:
+                    added = schedule.add_release_to_schedule(operation['page_title'])
+                    results.append((num, added is not False, 'the row was added' if added is not False
+                                    else 'the release is already in the schedule'))
+                except Exception as e:
+                    results.append((num, False, repr(e)))
+            else:
+                results.append((num, True, ''))
+        try:
+            resp = schedule.update_schedule_page()
+            if resp is None:
+                update_ok, update_message = True, 'no changes in the schedule'
+            elif resp.ok:
+                update_ok, update_message = True, 'the schedule was updated'
+            else:
+                update_ok, update_message = False, 'HTTP Error: ' + str(resp.status_code) + ' ' + resp.text
+        except Exception as e:
+            update_ok, update_message = False, repr(e)
+        seconds = time.monotonic() - started
+        operations = dict(operations)
+        return [
+            (num, self._result(
+                               operations[num],
+                               ok and update_ok,
+                               '; '.join([part for part in (message, update_message) if part]),
+                               seconds
+            ))
+            for num, ok, message in results
+        ]
+
+
+class ScheduleWatcher:
+    """keeps the schedule up to date with the release pages by polling the changes feed of confluence.
+    every poll searches release pages modified since the checkpoint(cql lastmodified > checkpoint and restrict),
+    only the changed pages which have open rows in the schedule are fetched and parsed,
+    and only their rows are updated, so a poll costs as many requests as there are changes.
+    the schedule is read again only if its version has changed.
+    the checkpoint is the newest version.when of the pages found, so it is on the clock of confluence, not of this host.
+    checkpoint - json file keeping the checkpoint between restarts, without it the first poll updates all rows.
+    timezone - tzinfo cql dates are read in, it's the timezone of the user in confluence.
+    if it's not set the checkpoint is written in the timezone confluence gives version.when in.
+    overlap - seconds the search goes back before the checkpoint, cql has minutes precision and
+    confluence may index a page a bit later, pages found again with the same version are skipped"""
+
+    def __init__(self, confluence, schedule_title, checkpoint=None, interval=60, workers=8,
+                 restrict='title ~ "release"', overlap=120, timezone=None):
+        self.confluence = confluence
+        self.schedule_title = schedule_title
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self.workers = workers
+        self.restrict = restrict
+        self.overlap = overlap
+        self.timezone = timezone
+        self.schedule = None
+        self.since = None
+        # versions of the pages found by the last search, they are not fetched again while the version is the same
+        self.seen = {}
+        self._read_checkpoint()
+
+    def _read_checkpoint(self):
+        if self.checkpoint is None:
+            return
+        try:
+            with open(self.checkpoint, encoding='utf-8') as checkpoint_file:
+                saved = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return
+        # a checkpoint of the host clock from the older versions is not used
+        if saved.get('schedule') == self.schedule_title and isinstance(saved.get('since'), str):
+            self.since = saved['since']
+            self.seen = saved.get('seen', {})
+
+    def _write_checkpoint(self):
+        if self.checkpoint is None:
+            return
+        data = json.dumps({'schedule': self.schedule_title, 'since': self.since, 'seen': self.seen},
+                          ensure_ascii=False)
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(self.checkpoint)),
+                                         suffix='.tmp', delete=False, encoding='utf-8') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_file.name, self.checkpoint)
+
+    def _load_schedule(self):
+        """read the schedule again if somebody else has changed it"""
+        if self.schedule is not None:
+            version = int(self.confluence.get_page(self.schedule_title, expand='version')['version']['number'])
+            if version == self.schedule.version:
+                return
+        self.schedule = Schedule(self.schedule_title, self.confluence, self.workers)
+
+    @staticmethod
+    def parse_timezone(name):
+        """'+03:00' or a name of the tz database like 'Europe/Moscow' -> tzinfo"""
+        if re.search(r'^[+-]\d\d:?\d\d$', name):
+            return datetime.strptime(name, '%z').tzinfo
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+
+    @staticmethod
+    def _when(content):
+        """version.when of the content as an aware datetime"""
+        return datetime.fromisoformat(content['version']['when'].replace('Z', '+00:00'))
+
+    def _cql_date(self, since):
+        when = datetime.fromisoformat(since)
+        cutoff = datetime.fromtimestamp(when.timestamp() - self.overlap, self.timezone or when.tzinfo)
+        return cutoff.strftime('%Y-%m-%d %H:%M')
+
+    def latest_change(self):
+        """version.when of the release page changed last, None if there are no release pages"""
+        cql = 'type=page and ' + self.restrict + ' order by lastmodified desc'
+        for content in self.confluence.iter_search(cql, expand='version', limit=1):
+            return self._when(content).isoformat()
+        return None
+
+    def changed_titles(self, since):
+        """titles of the release pages changed after since(version.when in iso format) which have open rows
+        in the schedule, the versions of all the pages found and the newest version.when of them"""
+        cql = 'type=page and ' + self.restrict + ' and lastmodified > "' + self._cql_date(since) + '"'
+        titles = []
+        seen = {}
+        newest = datetime.fromisoformat(since)
+        for content in self.confluence.iter_search(cql, expand='version'):
+            title = content['title']
+            seen[title] = int(content['version']['number'])
+            newest = max(newest, self._when(content))
+            row = self.schedule.index.get(title)
+            if row is None or 'PROD' in row.status or self.seen.get(title) == seen[title]:
+                continue
+            titles.append(title)
+        return titles, seen, newest.isoformat()
+
+    def poll(self):
+        """one update of the schedule, returns the titles of the release pages which were checked"""
+        self._load_schedule()
+        resp = None
+        seen = {}
+        if self.since is None:
+            # nothing is known about the changes before the first run, all rows are updated.
+            # the checkpoint is taken before, so the changes made during the update are found by the next poll,
+            # the pages found in the overlap now are not fetched again by it
+            titles = None
+            since = self.latest_change()
+            if since is not None:
+                seen = self.changed_titles(since)[1]
+            resp = self.schedule.update_schedule_page()
+        else:
+            titles, seen, since = self.changed_titles(self.since)
+            if titles:
+                resp = self.schedule.update_schedule_page(titles)
+        if resp is not None and not resp.ok:
+            # the checkpoint is not moved, the same changes are found by the next poll
+            print('FAILED: Schedule was not updated correctly. HTTP Error:', resp.content)
+            return titles
+        if titles:
+            print('OK:', len(titles), 'changed release pages were checked.')
+        if resp is not None:
+            print('OK: Schedule updated successfully.')
+        # the pages which were not parsed are tried again while they are in the overlap
+        for num, title, error in self.schedule.errors:
+            seen.pop(title, None)
+        self.since = since
+        self.seen = seen
+        self._write_checkpoint()
+        return titles
+
+    def run(self, polls=None):
+        """poll every interval seconds, forever if polls is None"""
+        done = 0
+        while polls is None or done < polls:
+            started = time.time()
+            try:
+                self.poll()
+            except Exception as e:
+                print('FAILED: Something went wrong with schedule watching.', e)
+            done = done + 1
+            if polls is None or done < polls:
+                time.sleep(max(0, self.interval - (time.time() - started)))
+
+
 def create_parser():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--url', required=True, help='confluence url, example: https://confluence.egovdev.ru')
-    parser.add_argument('--login', required=True, help='your login in confluence')
-    parser.add_argument('--password', required=True, help='your password in confluence')
+    parser.add_argument('--url', help='confluence url, example: https://confluence.egovdev.ru, required\
+                                      for everything but --query_releases')
+    parser.add_argument('--login', help='your login in confluence')
+    parser.add_argument('--password', help='your password in confluence')
     parser.add_argument('--page_title', help='example: SSFO-DUUS2-Release-2.2.2.2, required for:\
                                                                     --set_status_finalized, --set_permissions')
     parser.add_argument('--set_status_finalized', action='store_true',
@@ -404,76 +1938,212 @@ def create_parser():
                         help='change date of installing to prod on release page, value: dd-mm')
     parser.add_argument('--move_finalize_date',
                         help='change date of finalizing on release page, value: dd-mm')
+    parser.add_argument('--batch', help='json or yaml manifest of operations over many pages, see BatchRunner')
+    parser.add_argument('--report', help='with --batch: file to write the json report to, stdout if not set')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='how many release pages are fetched at the same time while updating the schedule')
+    parser.add_argument('--pool_size', type=int, default=10,
+                        help='how many keep-alive connections to confluence are kept open')
+    parser.add_argument('--timeout', type=float, default=30, help='timeout of a request to confluence, seconds')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='how many times a request is retried on 429 and 5xx responses')
+    parser.add_argument('--archive_prod_older_than', type=int,
+                        help='with --update_schedule: move PROD rows older than this number of days to archive pages')
+    parser.add_argument('--archive_period', choices=['year', 'quarter'], default='year',
+                        help='an archive page is created per year or per quarter')
+    parser.add_argument('--token_cache', help='file to keep the xml-rpc login token between runs')
+    parser.add_argument('--token_ttl', type=int, default=1200, help='seconds the cached xml-rpc token is used')
+    parser.add_argument('--cache_dir', help='directory to cache pages between runs, pages are not cached if not set')
+    parser.add_argument('--cache_size', type=int, default=100, help='max size of the pages cache, megabytes')
+    parser.add_argument('--watch', action='store_true',
+                        help='with --update_schedule: keep updating the schedule with the changed release pages')
+    parser.add_argument('--poll_interval', type=int, default=60, help='with --watch: seconds between polls')
+    parser.add_argument('--checkpoint', help='with --watch: file to keep the last poll time between restarts')
+    parser.add_argument('--watch_timezone',
+                        help='with --watch: timezone of the login in confluence cql dates are read in,\
+                             example: +03:00 or Europe/Moscow, the timezone of confluence answers if not set')
+    parser.add_argument('--watch_cql', default='title ~ "release"',
+                        help='with --watch: cql restricting the search of changed pages to release pages')
+    parser.add_argument('--index', help='sqlite file of the local index of release pages, see ReleaseIndex.\
+                                        with --update_schedule the rows are updated from the index,\
+                                        the index is synced with the release pages of the schedule before')
+    parser.add_argument('--sync_index', help='with --index: cql of the release pages to bring to the index,\
+                                             example: space = REL2018 and title ~ "release"')
+    parser.add_argument('--query_releases', action='store_true',
+                        help='with --index: print the indexed releases matching the filters below as json,\
+                             confluence is not requested')
+    parser.add_argument('--product', help='with --query_releases: product code from the page title, example: PGU')
+    parser.add_argument('--status', help='with --query_releases: status of the release, example: Тестирование')
+    parser.add_argument('--prod_from', help='with --query_releases: prod date from, yyyy-mm-dd')
+    parser.add_argument('--prod_to', help='with --query_releases: prod date to, yyyy-mm-dd')
+    parser.add_argument('--finalize_from', help='with --query_releases: finalize date from, yyyy-mm-dd')
+    parser.add_argument('--finalize_to', help='with --query_releases: finalize date to, yyyy-mm-dd')
+    parser.add_argument('--profile', nargs='?', const='-',
+                        help='record the calls to confluence and the phases timings and write the json summary\
+                             to the file, to stdout if the file is not set')
     return parser
 
 
+def print_releases(release_index, args_namespace):
+    """print the indexed releases matching the filters of the command line as json"""
+    records = release_index.query(
+                                product=args_namespace.product,
+                                status=args_namespace.status,
+                                prod_from=args_namespace.prod_from,
+                                prod_to=args_namespace.prod_to,
+                                finalize_from=args_namespace.finalize_from,
+                                finalize_to=args_namespace.finalize_to
+    )
+    print(json.dumps([record.to_dict() for record in records], ensure_ascii=False, indent=2))
+
+
 if __name__ == "__main__":
     parser = create_parser()
     args_namespace = parser.parse_args()
-    confluence = Confluence(args_namespace.url, args_namespace.login, args_namespace.password)
-    if args_namespace.set_status_finalized is True:
+    release_index = None
+    if args_namespace.index is not None:
+        release_index = ReleaseIndex(args_namespace.index)
+    if args_namespace.query_releases is True and args_namespace.sync_index is None:
+        if release_index is None:
+            parser.error('--query_releases requires --index')
+        print_releases(release_index, args_namespace)
+        exit(0)
+    if args_namespace.url is None or args_namespace.login is None or args_namespace.password is None:
+        parser.error('--url, --login and --password are required')
+    page_cache = None
+    if args_namespace.cache_dir is not None:
+        page_cache = PageCache(args_namespace.cache_dir, max_bytes=args_namespace.cache_size * 1024 * 1024)
+    profiler = None
+    if args_namespace.profile is not None:
+        profiler = Profiler()
+    confluence = Confluence(
+                            args_namespace.url,
+                            args_namespace.login,
+                            args_namespace.password,
+                            pool_size=args_namespace.pool_size,
+                            timeout=args_namespace.timeout,
+                            retries=args_namespace.retries,
+                            cache=page_cache,
+                            token_cache=args_namespace.token_cache,
+                            token_ttl=args_namespace.token_ttl,
+                            profiler=profiler
+    )
+    if args_namespace.batch is not None:
+        batch_runner = BatchRunner(confluence, args_namespace.workers)
+        batch_results = batch_runner.run(batch_runner.load_manifest(args_namespace.batch))
+        report = json.dumps(batch_results, ensure_ascii=False, indent=2)
+        if args_namespace.report is not None:
+            with open(args_namespace.report, 'w', encoding='utf-8') as report_file:
+                report_file.write(report)
+        else:
+            print(report)
+        failed = [result for result in batch_results if not result['ok']]
+        print('OK:' if not failed else 'FAILED:', len(batch_results) - len(failed), 'of', len(batch_results),
+              'operations succeeded.')
+        if profiler is not None:
+            profiler.dump(args_namespace.profile)
+        exit(1 if failed else 0)
+    if args_namespace.sync_index is not None:
+        if release_index is None:
+            parser.error('--sync_index requires --index')
+        try:
+            synced = release_index.sync(confluence, cql=args_namespace.sync_index, workers=args_namespace.workers)
+            print('OK:', synced['updated'], 'of', synced['checked'], 'release pages were updated in the index.')
+        except Exception as e:
+            print('FAILED: Something went wrong with the index syncing.', e)
+        if args_namespace.query_releases is True:
+            print_releases(release_index, args_namespace)
+    # all the edits of the release page are put to confluence as one new version
+    if args_namespace.set_status_finalized is True \
+            or args_namespace.move_finalize_date is not None \
+            or args_namespace.move_prod_date is not None:
         try:
             release = Release(args_namespace.page_title, confluence)
-            release.set_status('Финализирован')
-            resp = release.relpage.update()
-            if '200' in str(resp):
-                print('OK: Release status was changed.')
+            edit = release.edit()
+            done = []
+            if args_namespace.set_status_finalized is True:
+                edit.set_status('Финализирован')
+                done.append('Release status was changed.')
+            if args_namespace.move_finalize_date is not None:
+                edit.move_date_finalize(args_namespace.move_finalize_date)
+                done.append('finalizing date was moved.')
+            if args_namespace.move_prod_date is not None:
+                edit.move_date_prod(args_namespace.move_prod_date)
+                done.append('Installing to prod date was moved.')
+            resp = edit.commit()
+            if resp is None:
+                print('OK: Release page already has these values. No need to update it.')
+            elif '200' in str(resp):
+                for message in done:
+                    print('OK:', message)
             else:
-                print('FAILED: Release status was not changed.')
+                print('FAILED: Release page was not updated. HTTP Error:', resp.content)
         except IndexError:
             print('FAILED: release page does not exist.')
         except Exception as e:
-            print('FAILED: something went wrong with status updating.', e)
+            print('FAILED: something went wrong with release page updating.', e)
     if args_namespace.set_permissions is True:
         try:
-            release = Release(args_namespace.page_title, confluence)
-            to_set_perms_list = release.relpage.get_childs()
-            to_set_perms_list.append(release.relpage.page_title)
-            for page in to_set_perms_list:
-                page = Page(page, confluence)
-                resp = page.set_perms(
-                                'Edit',
-                                [{"groupName": "confluence-contentmgn"}]
-                )
-                if resp is True:
-                    print('OK: Permissions for the page', page.page_title, 'was set.')
+            perms_results = PagePermissions(confluence, args_namespace.workers).apply(
+                                                                            args_namespace.page_title,
+                                                                            'Edit',
+                                                                            [{"groupName": "confluence-contentmgn"}]
+            )
+            for result in perms_results:
+                if result['ok']:
+                    print('OK: Permissions for the page', result['title'], 'was set.')
                 else:
-                    print('FAILED: Permissions for the page', page.page_title, 'was not set.')
+                    print('FAILED: Permissions for the page', result['title'], 'was not set.', result['error'])
+        except IndexError:
+            print('FAILED: release page does not exist.')
         except Exception as e:
             print('FAILED: Something went wrong with permissions setting.', e)
-    if args_namespace.move_finalize_date is not None:
-        try:
-            release = Release(args_namespace.page_title, confluence)
-            release.move_date_finzlize(args_namespace.move_finalize_date)
-            resp = release.relpage.update()
-            if '200' in str(resp):
-                print('OK: finalizing date was moved.')
-            else:
-                print('FAILED: finalizing date was not moved. HTTP Error:', resp.content)
-        except Exception as e:
-            print('FAILED: Something went wrong moving the date.', e)
-    if args_namespace.move_prod_date is not None:
+    # SCHEDULE UPDATING SHOULD BE IN THE END CAUSE OF THAT IT READS THE RELEASE PAGES CHANGED ABOVE
+    if args_namespace.update_schedule is not None and args_namespace.watch is True:
+        watch_timezone = None
+        if args_namespace.watch_timezone is not None:
+            watch_timezone = ScheduleWatcher.parse_timezone(args_namespace.watch_timezone)
+        watcher = ScheduleWatcher(
+                                confluence,
+                                args_namespace.update_schedule,
+                                checkpoint=args_namespace.checkpoint,
+                                interval=args_namespace.poll_interval,
+                                workers=args_namespace.workers,
+                                restrict=args_namespace.watch_cql,
+                                timezone=watch_timezone
+        )
         try:
-            release = Release(args_namespace.page_title, confluence)
-            release.move_date_prod(args_namespace.move_prod_date)
-            resp = release.relpage.update()
-            if '200' in str(resp):
-                print('OK: Installing to prod date was moved.')
-            else:
-                print('FAILED: Installing to prod date was not moved. HTTP Error:', resp.content)
-        except Exception as e:
-            print('FAILED: Something went wrong moving the date.', e)
-    # SCHEDULE UPDATING SHOULD BE IN THE END CAUSE OF THAT CONTENTS EXIT()
-    if args_namespace.update_schedule is not None:
+            watcher.run()
+        except KeyboardInterrupt:
+            print('OK: Schedule watching was stopped.')
+    elif args_namespace.update_schedule is not None:
         try:
-            schedule = Schedule(args_namespace.update_schedule, confluence)
+            schedule = Schedule(args_namespace.update_schedule, confluence, args_namespace.workers,
+                                release_index=release_index)
+            if release_index is not None:
+                # only the versions are requested for the pages which were not changed
+                release_index.sync(
+                                confluence,
+                                titles=[row.release_title for row in schedule.rows
+                                        if row.release_title is not None and 'PROD' not in row.status],
+                                workers=args_namespace.workers
+                )
             if args_namespace.add_release_to_schedule is not None:
                 schedule.add_release_to_schedule(args_namespace.add_release_to_schedule)
+            if args_namespace.archive_prod_older_than is not None:
+                archived = schedule.archive_prod_rows(
+                                                    args_namespace.archive_prod_older_than,
+                                                    args_namespace.archive_period
+                )
+                print('OK:', archived, 'rows were moved to archive pages.')
             resp = schedule.update_schedule_page()
-            if '200' in str(resp):
+            if resp is None:
+                pass
+            elif '200' in str(resp):
                 print('OK: Schedule updated successfully.')
             else:
                 print('FAILED: Schedule was not updated correctly. HTTP Error:', resp.content)
         except Exception as e:
              print('FAILED: Something went wrong with schedule updating.', e)
-
+    if profiler is not None:
+        profiler.dump(args_namespace.profile)